@@ -0,0 +1,116 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# Configuration
+HERE = os.path.dirname(os.path.abspath(__file__))
+STARTUP_BUDGET_MS = 100  # allowed on top of a bare interpreter start
+HEAVY_MODULES = ["pandas", "requests", "bioservices", "asyncio", "numpy"]
+SCALING_SIZES = [50000, 100000, 200000, 400000]  # master rows; chaperones grow with the rows
+ROWS_PER_CHAPERONE = 2000
+SCALING_TOLERANCE = 2.0  # allowed growth of the per-row time from the smallest to the largest size
+
+def time_command(args, repeat):
+    """
+    Best-of-`repeat` wall time of a subprocess, in milliseconds.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=HERE, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+def bench_startup(repeat=5, budget_ms=STARTUP_BUDGET_MS):
+    """
+    Guards the cost of `import dataparser` and `dataparser.py --help`.
+    Fails if either exceeds the budget, or if importing pulls in a heavy module.
+    """
+    baseline = time_command([sys.executable, "-c", "pass"], repeat)
+    cases = {
+        "import dataparser": [sys.executable, "-c", "import dataparser"],
+        "dataparser.py --help": [sys.executable, "dataparser.py", "--help"],
+    }
+
+    print(f"Interpreter start: {baseline:.1f} ms (subtracted below)")
+    ok = True
+    for label, args in cases.items():
+        overhead = time_command(args, repeat) - baseline
+        status = "ok" if overhead <= budget_ms else "OVER BUDGET"
+        ok = ok and overhead <= budget_ms
+        print(f"  {label:<22} {overhead:7.1f} ms  (budget {budget_ms} ms)  {status}")
+
+    # dataparser may print a config warning on import, so the answer goes to stderr
+    probe = f"import sys, dataparser; sys.stderr.write(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    loaded = subprocess.run([sys.executable, "-c", probe], cwd=HERE, check=True,
+                            capture_output=True, text=True).stderr.strip()
+    if loaded:
+        print(f"  Heavy modules imported eagerly: {loaded}")
+        ok = False
+    return ok
+
+def synthetic_master(rows, seed=0):
+    """
+    A master table of `rows` rows over rows / ROWS_PER_CHAPERONE chaperones, 20000 targets and 5000 Pfam domains.
+    """
+    import numpy as np
+    import pandas as pd
+    rng = np.random.default_rng(seed)
+    n_chaperones = max(1, rows // ROWS_PER_CHAPERONE)
+    chaperones = pd.Categorical.from_codes(rng.integers(0, n_chaperones, rows), [f"CHAP{i}_HUMAN" for i in range(n_chaperones)])
+    domains = pd.Categorical.from_codes(rng.zipf(1.5, rows) % 5000, [f"PF{i:05d}" for i in range(5000)])
+    targets = pd.Categorical.from_codes(rng.integers(0, 20000, rows), [f"P{i:05d}" for i in range(20000)])
+    return pd.DataFrame({"Chaperone_Name": chaperones, "Target_ID": targets, "Domain_ID": domains})
+
+def bench_analyzer_scaling(repeat=3, sizes=SCALING_SIZES, tolerance=SCALING_TOLERANCE):
+    """
+    Times building the count matrices and the top-domain selection on growing tables
+    (more rows and more chaperones).
+    Fails if the time per row grows by more than `tolerance`, i.e. if the pass is not linear.
+    """
+    from domain_analyzer import build_count_matrices, top_domains
+    per_row = []
+    for rows in sizes:
+        df = synthetic_master(rows)
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            top_domains(build_count_matrices(df))
+            best = min(best, (time.perf_counter() - start) * 1000)
+        per_row.append(best / rows)
+        print(f"  {rows:>8} rows, {rows // ROWS_PER_CHAPERONE:>4} chaperones  {best:8.1f} ms  ({best / rows * 1000:.2f} us/row)")
+    
+    growth = per_row[-1] / per_row[0]
+    status = "ok" if growth <= tolerance else "NOT LINEAR"
+    print(f"  Per-row time growth: {growth:.2f}x  (tolerance {tolerance}x)  {status}")
+    return growth <= tolerance
+
+BENCHMARKS = {
+    "startup": bench_startup,
+    "analyzer": bench_analyzer_scaling,
+}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Performance benchmarks for the chaperone miner.")
+    parser.add_argument("names", nargs="*", metavar="NAME",
+                        help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    failed = []
+    for name in args.names or list(BENCHMARKS):
+        print(f"--- {name} ---")
+        if not BENCHMARKS[name]():
+            failed.append(name)
+
+    if failed:
+        print(f"FAILED: {', '.join(failed)}")
+        sys.exit(1)
+    print("All benchmarks within budget.")
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,38 @@
-import pandas as pd
-from bioservices import UniProt
-import requests
 import logging
 import io
+import argparse
+import importlib
+import importlib.util
+import shutil
+import sqlite3
+import threading
+import os
+import json
+import time
+import hashlib
+import random
+import gzip
+import mmap
+import zipfile
+from urllib.parse import urlsplit, urlencode
 from io import StringIO
 
+class LazyModule:
+    """
+    Stand-in for a heavy module that is only imported on first attribute access,
+    so importing dataparser (or running --help) does not pay for pandas, requests, etc.
+    """
+    def __init__(self, name):
+        self._name = name
+    
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+pd = LazyModule("pandas")
+requests = LazyModule("requests")
+asyncio = LazyModule("asyncio")
+futures = LazyModule("concurrent.futures")
+
 # Import configuration
 try:
     import config
@@ -36,207 +64,1696 @@ CHAPERONE_LIST = [
 
 USE_BIOGRID = True 
 BIOGRID_ACCESS_KEY = config.BIOGRID_ACCESS_KEY
+BIOGRID_URL = "https://webservice.thebiogrid.org/interactions/"
+BIOGRID_PAGE_SIZE = 10000  # BioGRID's maximum rows per request
+BIOGRID_PAGE_WORKERS = 4
+BIOGRID_PHYSICAL_ONLY = True
+GENE_MAP_FILE = "gene_symbol_map.json"  # cached accession <-> gene symbol mappings for BioGRID
+# BioGRID source: "web" (REST service, needs the access key) or "tab3" (local release archive, no key)
+BIOGRID_SOURCE = "web"
+BIOGRID_TAB3_FILE = "BIOGRID-ORGANISM-LATEST.tab3.zip"  # BIOGRID-ALL or BIOGRID-ORGANISM TAB3 zip from downloads.thebiogrid.org
+
+# Concurrent mining: fetch all chaperones at once, at most MAX_CONCURRENCY in flight
+USE_ASYNC = True
+MAX_CONCURRENCY = 8
+
+# Shared HTTP client: keep-alive pools per host, gzip, common timeouts
+HTTP_TIMEOUT = (10, 30)  # (connect, read) seconds
+HTTP_POOL_CONNECTIONS = 10  # number of host pools kept alive by the default adapter
+HTTP_POOL_MAXSIZE = MAX_CONCURRENCY  # connections kept per host
+HTTP_HOST_POOL_SIZES = {
+    "https://www.ebi.ac.uk": None,  # None: MAX_CONCURRENCY chaperones x INTACT_PAGE_WORKERS pages each
+    "https://webservice.thebiogrid.org": 4,
+}
+
+# Per-host rate limits (requests/second, burst) and retry policy for throttled or failing calls
+RATE_LIMITS = {
+    "www.ebi.ac.uk": (10.0, 10),
+    "rest.uniprot.org": (10.0, 10),
+    "webservice.thebiogrid.org": (2.0, 2),
+}
+DEFAULT_RATE_LIMIT = (5.0, 5)
+MAX_RETRIES = 5
+RETRY_BACKOFF = 1.0  # base delay in seconds, doubled on each attempt
+RETRY_MAX_DELAY = 60.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# On-disk cache for PSICQUIC responses (IntAct only changes with releases)
+USE_HTTP_CACHE = True
+CACHE_DIR = ".cache/http"
+CACHE_TTL = 7 * 24 * 3600  # seconds before a cached payload is revalidated with the server
+
+INTACT_SEARCH_URL = "https://www.ebi.ac.uk/Tools/webservices/psicquic/intact/webservices/current/search"
+
+# Paged PSICQUIC retrieval: ask for the interaction count, then fetch pages in parallel
+USE_PAGED_INTACT = True
+INTACT_PAGE_SIZE = 2500
+INTACT_PAGE_WORKERS = 4
+INTACT_PAGE_RETRIES = 2  # re-reads of a page whose body broke off; HTTP errors are retried by http_request
+
+# Interaction source: "web" (PSICQUIC queries) or "dump" (one pass over a local IntAct PSI-MITAB file)
+INTACT_SOURCE = "web"
+INTACT_DUMP_FILE = "intact.txt"  # plain or gzipped (.gz) MITAB, e.g. from ftp.ebi.ac.uk/pub/databases/intact/current/psimitab/
+DUMP_READ_CHUNK = 1 << 24  # bytes read (or mapped) per step while streaming a dump
+
+# Batched PSICQUIC mode: one MIQL query per group of chaperones instead of one per chaperone
+USE_BATCHED_INTACT = False
+INTACT_BATCH_SIZE = 10
+
+# Checkpoints written as the run goes, so an interrupted run can continue with --resume
+CHECKPOINT_DIR = "checkpoints"
+
+# Incremental refresh (--refresh): per-chaperone IntAct counts and partner digests from the last run
+REFRESH_STATE_FILE = "refresh_state.json"
+
+# Local accession -> protein name -> Pfam store, consulted before UniProt
+USE_DOMAIN_STORE = True
+DOMAIN_STORE_FILE = "domain_store.sqlite"
+DOMAIN_STORE_TTL = 90 * 24 * 3600  # seconds before an accession is looked up again
+
+# Domain retrieval through UniProt's /stream endpoint: few large batches instead of 20-accession UniProt.search calls
+USE_UNIPROT_STREAM = True
+UNIPROT_STREAM_URL = "https://rest.uniprot.org/uniprotkb/stream"
+UNIPROT_MAX_URL_LENGTH = 7000  # stay well below the 8 KB request-line limit of common proxies
+UNIPROT_MAX_BATCH = 500
+UNIPROT_TSV_CHUNK_ROWS = 1000
+DOMAIN_WORKERS = 4  # domain batches in flight; the rest.uniprot.org rate limit still applies
+DOMAIN_CHUNK_RETRIES = 2  # re-reads of a batch whose body broke off; HTTP errors are retried by http_request
+
+# Domain source: "uniprot" (remote, backed by the domain store) or "local" (pre-built index of a Pfam/UniProt dump)
+DOMAIN_SOURCE = "uniprot"
+DOMAIN_INDEX_FILE = "domain_index.sqlite"  # built with --build-domain-index
+DOMAIN_INDEX_CHUNK_ROWS = 200000
+
+DOMAIN_COLUMNS = ["Target_ID", "Target_Protein_Name", "Domain_ID"]
+
+# Entry name -> accession cache; only names missing from it are sent to UniProt ID mapping
+ACCESSION_MAP_FILE = "accession_map.json"
+ACCESSION_MAP_VERSION = 1  # bump to invalidate every cached mapping
+UNIPROT_IDMAPPING_URL = "https://rest.uniprot.org/idmapping"
+IDMAPPING_POLL_INTERVAL = 2.0  # seconds between job status checks
+IDMAPPING_TIMEOUT = 300.0
+
+# Output tables: "csv" or "parquet" (needs pyarrow; string columns are dictionary-encoded).
+# The extension of the file names below follows the format.
+OUTPUT_FORMAT = "csv"
+PARQUET_COMPRESSION = "zstd"
 
 INTERACTIONS_FILE = "chaperone_interactions.csv"
 DOMAINS_FILE = "target_domains.csv"
 MASTER_FILE = "chaperone_domain_analysis_master.csv"
 
-# Silence Bioservices logging
-logging.getLogger("bioservices").setLevel(logging.ERROR)
-u = UniProt()
+_uniprot_client = None
+_uniprot_client_lock = threading.Lock()
 
-def get_uniprot_accessions(gene_names):
-    print(f"Mapping {len(gene_names)} chaperone names to UniProt IDs...")
-    results = u.mapping("UniProtKB_AC-ID", "UniProtKB", ",".join(gene_names))
-    mapping_dict = {}
-    
-    if "results" in results:
-        for result in results["results"]:
-            input_name = result["from"]
-            val = result["to"]
+def get_uniprot_client():
+    """
+    The bioservices UniProt client, built on first use (construction imports bioservices
+    and may touch the network).
+    """
+    global _uniprot_client
+    with _uniprot_client_lock:
+        if _uniprot_client is None:
+            from bioservices import UniProt
+            # Silence Bioservices logging
+            logging.getLogger("bioservices").setLevel(logging.ERROR)
+            _uniprot_client = UniProt()
+    return _uniprot_client
+
+# ==========================================
+# HTTP CLIENT
+# ==========================================
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def get_http_session():
+    """
+    Returns the process-wide requests.Session, creating it on first use.
+    Connections are pooled per host, so the TCP+TLS handshake is paid once per host.
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            from requests.adapters import HTTPAdapter
+            session = requests.Session()
+            session.headers.update({"Accept-Encoding": "gzip, deflate"})
             
-            # FIX: Handle case where 'to' is a dictionary object
-            if isinstance(val, dict):
-                # Try to find primary accession
-                accession = val.get("primaryAccession", str(val))
-            else:
-                accession = str(val)
+            default_adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+            session.mount("https://", default_adapter)
+            session.mount("http://", default_adapter)
+            # Longest prefix wins, so these override the default adapter for their host
+            for prefix, pool_size in HTTP_HOST_POOL_SIZES.items():
+                if pool_size is None:
+                    # Every chaperone worker may have a full set of PSICQUIC pages in flight
+                    pool_size = max(1, MAX_CONCURRENCY) * max(1, INTACT_PAGE_WORKERS)
+                session.mount(prefix, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
                 
-            mapping_dict[input_name] = accession
+            _http_session = session
+    return _http_session
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`.
+    """
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+    
+    def pause(self, seconds):
+        """Holds back every caller of this host, e.g. after a 429 with Retry-After."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(host):
+    with _rate_limiters_lock:
+        if host not in _rate_limiters:
+            rate, burst = RATE_LIMITS.get(host, DEFAULT_RATE_LIMIT)
+            _rate_limiters[host] = TokenBucket(rate, burst)
+        return _rate_limiters[host]
+
+def backoff_delay(attempt, retry_after=None):
+    """
+    Seconds to wait before retry number `attempt`: the server's Retry-After when given,
+    otherwise exponential backoff with full jitter.
+    """
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            import email.utils
+            try:
+                delay = email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time()
+            except (TypeError, ValueError):
+                delay = None
+        if delay is not None:
+            return min(max(delay, 0.0), RETRY_MAX_DELAY)
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BACKOFF * 2 ** attempt))
+
+def http_request(method, url, **kwargs):
+    """
+    Request through the shared session with the default timeout applied.
+    Calls are paced by the host's token bucket; 429/5xx responses and connection errors
+    are retried up to MAX_RETRIES times with backoff (honouring Retry-After).
+    """
+    kwargs.setdefault("timeout", HTTP_TIMEOUT)
+    limiter = get_rate_limiter(urlsplit(url).hostname)
+    
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire()
+        try:
+            r = get_http_session().request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == MAX_RETRIES:
+                raise
+            delay = backoff_delay(attempt)
+            print(f"    {e.__class__.__name__} for {url}, retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        
+        if r.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            return r
+        
+        delay = backoff_delay(attempt, r.headers.get("Retry-After"))
+        r.close()
+        if r.status_code == 429:
+            limiter.pause(delay)
+        print(f"    HTTP {r.status_code} from {urlsplit(url).hostname}, retrying in {delay:.1f}s")
+        time.sleep(delay)
+
+def body_read_errors():
+    """
+    Failures while reading or parsing a response body. They happen after http_request has
+    returned, so its retries do not cover them; callers may retry the whole fetch on these
+    (and only these, so a request http_request already gave up on is not repeated).
+    """
+    urllib3_errors = importlib.import_module("urllib3.exceptions")
+    # Streams parsed straight from r.raw surface urllib3's own errors rather than requests'
+    return (requests.exceptions.ChunkedEncodingError, requests.exceptions.ContentDecodingError,
+            urllib3_errors.ProtocolError, urllib3_errors.DecodeError, ValueError)
+
+def http_get(url, params=None, **kwargs):
+    return http_request("GET", url, params=params, **kwargs)
+
+def http_post(url, data=None, **kwargs):
+    return http_request("POST", url, data=data, **kwargs)
+
+def uniprot_call(method, *args, **kwargs):
+    """
+    Calls a bioservices UniProt method under the rest.uniprot.org rate limit, retrying
+    exceptions and throttling status codes (bioservices returns the int status on failure).
+    """
+    limiter = get_rate_limiter("rest.uniprot.org")
+    for attempt in range(MAX_RETRIES + 1):
+        limiter.acquire()
+        try:
+            result = method(*args, **kwargs)
+        except Exception as e:
+            if attempt == MAX_RETRIES:
+                raise
+            print(f"    UniProt error ({e}), retrying")
+        else:
+            if not (isinstance(result, int) and result in RETRY_STATUSES) or attempt == MAX_RETRIES:
+                return result
+            print(f"    UniProt returned {result}, retrying")
+        time.sleep(backoff_delay(attempt))
+
+# ==========================================
+# RESPONSE CACHE
+# ==========================================
+CACHE_STATS = {"hits": 0, "misses": 0, "revalidated": 0}
+_cache_stats_lock = threading.Lock()
+
+def _count_cache(event):
+    with _cache_stats_lock:
+        CACHE_STATS[event] += 1
+
+def cache_key(url, params=None):
+    """
+    Content address of a request: sha256 over the URL and its sorted query parameters.
+    """
+    items = sorted((str(k), str(v)) for k, v in (params or {}).items())
+    return hashlib.sha256(json.dumps([url, items]).encode("utf-8")).hexdigest()
+
+def _cache_paths(key):
+    folder = os.path.join(CACHE_DIR, key[:2])
+    return os.path.join(folder, key + ".body"), os.path.join(folder, key + ".json")
+
+def fetch_cached(url, params=None, ttl=None):
+    """
+    Returns the path of a local file holding the response body for url+params.
+    Fresh entries (younger than ttl) are served without network access; stale entries are
+    revalidated with If-None-Match / If-Modified-Since when the server sent ETag / Last-Modified.
+    Raises requests.HTTPError for any status other than 200 (or 304 on revalidation).
+    """
+    ttl = CACHE_TTL if ttl is None else ttl
+    body_path, meta_path = _cache_paths(cache_key(url, params))
+    
+    meta = None
+    if os.path.exists(body_path) and os.path.exists(meta_path):
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            meta = None
+    
+    if meta and time.time() - meta["fetched_at"] < ttl:
+        _count_cache("hits")
+        return body_path
+    
+    headers = {}
+    if meta:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+    
+    r = http_get(url, params=params, headers=headers, stream=True)
+    with r:
+        if r.status_code == 304 and meta:
+            _count_cache("revalidated")
+        elif r.status_code == 200:
+            _count_cache("misses")
+            os.makedirs(os.path.dirname(body_path), exist_ok=True)
+            # Unique temp name so concurrent fetches of the same key cannot interleave
+            tmp_path = f"{body_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                for chunk in r.iter_content(chunk_size=1 << 16):
+                    f.write(chunk)
+            os.replace(tmp_path, body_path)
+            meta = {
+                "url": url,
+                "params": params or {},
+                "etag": r.headers.get("ETag"),
+                "last_modified": r.headers.get("Last-Modified"),
+            }
+        else:
+            raise requests.HTTPError(f"status {r.status_code}", response=r)
+    
+    meta["fetched_at"] = time.time()
+    with open(meta_path, "w") as f:
+        json.dump(meta, f)
+    return body_path
+
+# ==========================================
+# CHECKPOINTS
+# ==========================================
+def _checkpoint_path(kind, key):
+    return os.path.join(CHECKPOINT_DIR, kind, f"{key}.json")
+
+def save_checkpoint(kind, key, data):
+    """
+    Atomically records a finished unit of work (e.g. kind='interactions', key=chaperone name).
+    """
+    path = _checkpoint_path(kind, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+def load_checkpoint(kind, key):
+    """
+    Returns the data saved for a finished unit, or None if it has not completed.
+    """
+    try:
+        with open(_checkpoint_path(kind, key)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def clear_checkpoints():
+    shutil.rmtree(CHECKPOINT_DIR, ignore_errors=True)
+
+# ==========================================
+# DOMAIN STORE
+# ==========================================
+def open_domain_store(path=None):
+    """
+    Opens (creating if needed) the SQLite store of UniProt accession -> protein name -> Pfam IDs.
+    Every looked-up accession gets a `proteins` row; one with no `domains` rows is a negative
+    entry (no Pfam cross-reference, or not returned by UniProt at all).
+    """
+    conn = sqlite3.connect(path or DOMAIN_STORE_FILE)
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS proteins (
+            accession TEXT PRIMARY KEY,
+            protein_name TEXT,
+            fetched_at REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS domains (
+            accession TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            domain_id TEXT NOT NULL,
+            PRIMARY KEY (accession, position)
+        );
+    """)
+    return conn
+
+def store_lookup(conn, accessions, ttl=None):
+    """
+    Returns (domain table of the hits, misses) for the given accessions.
+    Entries older than ttl (default DOMAIN_STORE_TTL) count as misses.
+    """
+    ttl = DOMAIN_STORE_TTL if ttl is None else ttl
+    oldest = time.time() - ttl
+    found = set()
+    records = []
+    for i in range(0, len(accessions), 500):
+        chunk = accessions[i:i+500]
+        marks = ",".join("?" * len(chunk))
+        found.update(acc for (acc,) in conn.execute(
+            f"SELECT accession FROM proteins WHERE accession IN ({marks}) AND fetched_at >= ?",
+            (*chunk, oldest)))
+        records.extend(conn.execute(
+            f"""SELECT d.accession, p.protein_name, d.domain_id
+                FROM domains d JOIN proteins p ON p.accession = d.accession
+                WHERE d.accession IN ({marks}) AND p.fetched_at >= ?
+                ORDER BY d.accession, d.position""",
+            (*chunk, oldest)))
+    misses = [acc for acc in accessions if acc not in found]
+    return pd.DataFrame.from_records(records, columns=DOMAIN_COLUMNS), misses
+
+def store_save(conn, requested, table):
+    """
+    Records the result of a UniProt lookup: the returned domain table, plus a negative entry
+    for every requested accession that produced no rows.
+    """
+    now = time.time()
+    names = {}
+    domains = {}
+    for acc, name, domain_id in zip(table["Target_ID"], table["Target_Protein_Name"], table["Domain_ID"]):
+        names.setdefault(acc, name)
+        domains.setdefault(acc, []).append(domain_id)
+    for acc in requested:
+        names.setdefault(acc, None)
+    
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO proteins VALUES (?, ?, ?)",
+                         [(acc, name, now) for acc, name in names.items()])
+        conn.executemany("DELETE FROM domains WHERE accession = ?", [(acc,) for acc in names])
+        conn.executemany("INSERT INTO domains VALUES (?, ?, ?)",
+                         [(acc, pos, domain_id) for acc, ids in domains.items() for pos, domain_id in enumerate(ids)])
+
+def build_domain_index(dump_path, index_path=None):
+    """
+    Pre-indexes a local domain dump into an SQLite file with the domain store schema,
+    so lookups are primary-key (B-tree, O(log n)) reads. Two formats are recognised:
+    - Pfam-A.regions.uniprot.tsv[.gz] (uniprot_acc, ..., pfamA_acc, seq_start, ...): domains
+      are ordered by first occurrence along the sequence; names are not part of this file
+      and are recorded as "Unknown".
+    - A UniProt TSV export with Entry / Protein names / Pfam columns (same fields as the
+      remote queries), which also carries protein names.
+    """
+    index_path = index_path or DOMAIN_INDEX_FILE
+    tmp_path = index_path + ".building"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    
+    conn = open_domain_store(tmp_path)
+    now = time.time()
+    reader = pd.read_csv(dump_path, sep='\t', dtype=str, chunksize=DOMAIN_INDEX_CHUNK_ROWS)
+    print(f"Indexing {dump_path} into {index_path}...")
+    
+    with conn:
+        first = True
+        for chunk in reader:
+            if first:
+                is_regions = "pfamA_acc" in chunk.columns
+                if is_regions:
+                    conn.execute("CREATE TEMP TABLE regions (accession TEXT, domain_id TEXT, seq_start INTEGER)")
+                first = False
+            if is_regions:
+                conn.executemany("INSERT INTO regions VALUES (?, ?, ?)",
+                                 zip(chunk["uniprot_acc"], chunk["pfamA_acc"], chunk["seq_start"].astype(int)))
+            else:
+                table = domain_table_from_frame(chunk)
+                conn.executemany("INSERT OR REPLACE INTO proteins VALUES (?, ?, ?)",
+                                 [(acc, None, now) for acc in chunk["Entry"]])
+                store_save(conn, [], table)
+        
+        if not first and is_regions:
+            conn.execute("INSERT OR REPLACE INTO proteins SELECT DISTINCT accession, 'Unknown', ? FROM regions", (now,))
+            conn.execute("""
+                INSERT INTO domains (accession, position, domain_id)
+                SELECT accession,
+                       ROW_NUMBER() OVER (PARTITION BY accession ORDER BY first_start, domain_id) - 1,
+                       domain_id
+                FROM (SELECT accession, domain_id, MIN(seq_start) AS first_start
+                      FROM regions GROUP BY accession, domain_id)
+            """)
+            conn.execute("DROP TABLE regions")
+    
+    proteins = conn.execute("SELECT COUNT(*) FROM proteins").fetchone()[0]
+    domains = conn.execute("SELECT COUNT(*) FROM domains").fetchone()[0]
+    conn.close()
+    os.replace(tmp_path, index_path)
+    print(f"Indexed {proteins} accessions with {domains} domain entries.")
+
+def get_domains_from_index(accession_list, index_path=None):
+    """
+    Domain table for the accessions from the local index, fully offline.
+    Accessions missing from the index have no domains.
+    """
+    index_path = index_path or DOMAIN_INDEX_FILE
+    if not os.path.exists(index_path):
+        raise FileNotFoundError(f"'{index_path}' not found. Build it with --build-domain-index.")
+    conn = sqlite3.connect(index_path)
+    try:
+        table, misses = store_lookup(conn, list(accession_list), ttl=float("inf"))
+    finally:
+        conn.close()
+    print(f"  {len(accession_list) - len(misses)} targets found in {index_path}, {len(misses)} not indexed")
+    return table
+
+# ==========================================
+# DATA SOURCES
+# ==========================================
+
+def run_coroutine(coro):
+    """
+    asyncio.run for synchronous callers. Inside a running event loop (a Jupyter cell, a coroutine)
+    asyncio.run refuses to start, so the coroutine then gets its own loop in a worker thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with futures.ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, coro).result()
+
+def load_accession_map():
+    """
+    Cached entry name -> accession mappings. A file written under another
+    ACCESSION_MAP_VERSION is ignored.
+    """
+    try:
+        with open(ACCESSION_MAP_FILE) as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if cached.get("version") != ACCESSION_MAP_VERSION:
+        return {}
+    return cached.get("entries", {})
+
+def save_accession_map(entries):
+    with open(ACCESSION_MAP_FILE, "w") as f:
+        json.dump({"version": ACCESSION_MAP_VERSION, "entries": entries}, f, indent=1, sort_keys=True)
+
+def parse_mapping_results(results):
+    mapping_dict = {}
+    for result in results:
+        input_name = result["from"]
+        val = result["to"]
+        
+        # FIX: Handle case where 'to' is a dictionary object
+        if isinstance(val, dict):
+            # Try to find primary accession
+            accession = val.get("primaryAccession", str(val))
+        else:
+            accession = str(val)
             
-    print(f"Successfully mapped {len(mapping_dict)} chaperones.")
+        mapping_dict[input_name] = accession
     return mapping_dict
 
-def get_intact_interactions(chaperone_acc):
+async def run_idmapping_job(ids, from_db="UniProtKB_AC-ID", to_db="UniProtKB", extra=None):
     """
-    Queries IntAct via PSICQUIC web service for protein interactions.
-    Documentation: https://www.ebi.ac.uk/Tools/webservices/psicquic/intact/webservices/
+    Submits one UniProt ID-mapping job and polls it with asyncio.sleep, so other
+    coroutines keep running meanwhile. Returns (mapping, UniProt release).
     """
-    targets = set()
+    r = await asyncio.to_thread(http_post, f"{UNIPROT_IDMAPPING_URL}/run",
+                                data={"from": from_db, "to": to_db, "ids": ",".join(ids), **(extra or {})})
+    r.raise_for_status()
+    job_id = r.json()["jobId"]
     
-    # Correct PSICQUIC endpoint for IntAct
-    intact_url = f"https://www.ebi.ac.uk/Tools/webservices/psicquic/intact/webservices/current/search/interactor/{chaperone_acc}?format=tab25"
+    deadline = time.monotonic() + IDMAPPING_TIMEOUT
+    while True:
+        r = await asyncio.to_thread(http_get, f"{UNIPROT_IDMAPPING_URL}/status/{job_id}", allow_redirects=False)
+        r.raise_for_status()
+        # A finished job redirects to its results; a running one reports jobStatus
+        if r.status_code == 303 or "jobStatus" not in r.json():
+            break
+        if r.json()["jobStatus"] not in ("NEW", "RUNNING"):
+            raise RuntimeError(f"ID mapping job {job_id} ended with status {r.json()['jobStatus']}")
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"ID mapping job {job_id} still running after {IDMAPPING_TIMEOUT:.0f}s")
+        await asyncio.sleep(IDMAPPING_POLL_INTERVAL)
     
+    results_url = f"{UNIPROT_IDMAPPING_URL}/results/stream/{job_id}"
+    if to_db.startswith("UniProtKB"):
+        results_url = f"{UNIPROT_IDMAPPING_URL}/uniprotkb/results/stream/{job_id}"
+    r = await asyncio.to_thread(http_get, results_url, params={"format": "json", "fields": "accession"})
+    r.raise_for_status()
+    return parse_mapping_results(r.json().get("results", [])), r.headers.get("X-UniProt-Release")
+
+async def map_accessions_async(gene_names):
+    """
+    Entry name -> accession for gene_names. Names in the mapping cache resolve locally;
+    the rest go to UniProt as a single ID-mapping job and are added to the cache.
+    """
+    cached = load_accession_map()
+    missing = [name for name in gene_names if name not in cached]
+    if missing:
+        print(f"Submitting {len(missing)} chaperone names to UniProt ID mapping...")
+        mapped, release = await run_idmapping_job(missing)
+        now = time.time()
+        for name, accession in mapped.items():
+            cached[name] = {"accession": accession, "release": release, "mapped_at": now}
+        save_accession_map(cached)
+    return {name: cached[name]["accession"] for name in gene_names if name in cached}
+
+def get_uniprot_accessions(gene_names):
+    print(f"Mapping {len(gene_names)} chaperone names to UniProt IDs...")
     try:
-        r = requests.get(intact_url, timeout=30)
-        
+        mapping_dict = run_coroutine(map_accessions_async(gene_names))
+    except Exception as e:
+        print(f"  Error mapping chaperone names: {e}")
+        mapping_dict = {name: entry["accession"] for name, entry in load_accession_map().items() if name in gene_names}
+    print(f"Successfully mapped {len(mapping_dict)} chaperones.")
+    return mapping_dict
+
+def iter_remote_lines(url, params=None, ttl=None):
+    """
+    Yields the decoded lines of a response body one at a time, so memory stays bounded
+    by the longest line rather than the payload size. Served from the disk cache when enabled
+    (ttl overrides CACHE_TTL; ttl=0 forces revalidation). Raises requests.HTTPError for non-200 responses.
+    """
+    if USE_HTTP_CACHE:
+        body_path = fetch_cached(url, params=params, ttl=ttl)
+        with open(body_path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                yield line.rstrip("\r\n")
+        return
+    
+    r = http_get(url, params=params, stream=True)
+    with r:
         if r.status_code != 200:
-            print(f"  Error: IntAct API returned status {r.status_code}")
-            return []
-            
-        lines = r.text.splitlines()
+            raise requests.HTTPError(f"status {r.status_code}", response=r)
+        r.encoding = r.encoding or "utf-8"
+        for line in r.iter_lines(chunk_size=1 << 16, decode_unicode=True):
+            yield line
+
+def parse_psicquic_id(raw):
+    if "uniprotkb:" in raw:
+        return raw.split(":")[1].split("-")[0]
+    return None
+
+def iter_tab25_partners(lines, chaperone_acc):
+    """
+    Streams MITAB (tab25) lines and yields the UniProt accession of every interactor
+    other than chaperone_acc. Only the first two columns (ID A, ID B) are split off.
+    """
+    for line in lines:
+        if not line or line.startswith('#'): continue
+        
+        cols = line.split('\t', 2)
+        if len(cols) < 2: continue
         
+        id_a = parse_psicquic_id(cols[0])
+        id_b = parse_psicquic_id(cols[1])
+        
+        if id_a and id_a != chaperone_acc: yield id_a
+        if id_b and id_b != chaperone_acc: yield id_b
+
+def iter_chunk_lines(read_chunk):
+    """
+    Splits the byte chunks returned by read_chunk() (until it returns b"") into decoded lines,
+    carrying a partial last line over to the next chunk.
+    """
+    pending = b""
+    while True:
+        chunk = read_chunk()
+        if not chunk:
+            break
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
         for line in lines:
-            if not line or line.startswith('#'): continue
-                
-            cols = line.split('\t')
-            if len(cols) < 2: continue
-            
-            # Parse Columns 0 and 1 (ID A and ID B)
-            raw_id_a = cols[0]
-            raw_id_b = cols[1]
-            
-            def parse_id(raw):
-                if "uniprotkb:" in raw:
-                    return raw.split(":")[1].split("-")[0]
-                return None
+            yield line.rstrip(b"\r").decode("utf-8", errors="replace")
+    if pending:
+        yield pending.rstrip(b"\r").decode("utf-8", errors="replace")
 
-            id_a = parse_id(raw_id_a)
-            id_b = parse_id(raw_id_b)
-            
-            if id_a and id_a != chaperone_acc: targets.add(id_a)
-            if id_b and id_b != chaperone_acc: targets.add(id_b)
-            
-    except Exception as e:
-        print(f"  Error querying IntAct: {e}")
+def iter_dump_lines(path):
+    """
+    Streams a local MITAB dump. Plain files are memory-mapped and walked DUMP_READ_CHUNK bytes
+    at a time; gzipped files are decompressed in chunks of the same size.
+    """
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            yield from iter_chunk_lines(lambda: f.read(DUMP_READ_CHUNK))
+        return
+    
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield from iter_chunk_lines(lambda: mm.read(DUMP_READ_CHUNK))
+
+def get_intact_interactions_from_dump(chaperone_accs, path=None):
+    """
+    Partners of every chaperone from a local IntAct PSI-MITAB dump, in a single pass.
+    Rows are matched against the chaperone set with a hash lookup and attributed exactly
+    as for batched PSICQUIC queries. Returns {accession: [partners]}.
+    """
+    path = path or INTACT_DUMP_FILE
+    print(f"Scanning {path} for {len(chaperone_accs)} chaperones...")
+    targets = {acc: set() for acc in chaperone_accs}
+    for owner, partner in iter_tab25_attributed(iter_dump_lines(path), chaperone_accs):
+        targets[owner].add(partner)
+    return {acc: list(partners) for acc, partners in targets.items()}
+
+def get_psicquic_count(url, params=None, ttl=None):
+    """
+    Number of interactions a PSICQUIC query returns (format=count).
+    """
+    count_params = {k: v for k, v in (params or {}).items() if k != "format"}
+    count_params["format"] = "count"
+    for line in iter_remote_lines(url, count_params, ttl=ttl):
+        if line.strip():
+            return int(line.strip())
+    return 0
+
+def fetch_psicquic_paged(url, params, parse_lines, ttl=None):
+    """
+    Runs parse_lines over every page of a PSICQUIC query and returns the union of what it yields.
+    The count is fetched first, then pages of INTACT_PAGE_SIZE (firstResult/maxResults) are
+    fetched in parallel. Each page is retried on its own, so one slow page cannot truncate the result.
+    """
+    total = get_psicquic_count(url, params, ttl=ttl)
+    if total <= INTACT_PAGE_SIZE:
+        page_params = [dict(params)]
+    else:
+        page_params = [
+            {**params, "firstResult": first, "maxResults": INTACT_PAGE_SIZE}
+            for first in range(0, total, INTACT_PAGE_SIZE)
+        ]
+    
+    def fetch_page(p):
+        for attempt in range(INTACT_PAGE_RETRIES + 1):
+            try:
+                return set(parse_lines(iter_remote_lines(url, p, ttl=ttl)))
+            except body_read_errors() as e:
+                if attempt == INTACT_PAGE_RETRIES:
+                    raise
+                print(f"    Retrying page {p.get('firstResult', 0)} of {url} ({e})")
+    
+    merged = set()
+    with futures.ThreadPoolExecutor(max_workers=max(1, min(INTACT_PAGE_WORKERS, len(page_params)))) as pool:
+        for page_result in pool.map(fetch_page, page_params):
+            merged |= page_result
+    return merged
+
+def parse_mitab_uniprot_ids(field):
+    """
+    All UniProt accessions (isoform suffix dropped) in a MITAB identifier/alias field,
+    e.g. 'uniprotkb:P07900-2|intact:EBI-296047' -> ['P07900'].
+    """
+    ids = []
+    for item in field.split("|"):
+        if item.startswith("uniprotkb:"):
+            ids.append(item[len("uniprotkb:"):].split("(")[0].split("-")[0])
+    return ids
+
+def iter_tab25_attributed(lines, chaperone_accs):
+    """
+    Streams MITAB (tab25) lines from a multi-chaperone query and yields (chaperone, partner) pairs.
+    A row belongs to every chaperone named in its identifier, alternative identifier or alias
+    columns (what the interactor/{acc} endpoint matches on); the partners are then taken
+    from ID A / ID B exactly as iter_tab25_partners does.
+    """
+    chaperone_accs = set(chaperone_accs)
+    for line in lines:
+        if not line or line.startswith('#'): continue
+        
+        cols = line.split('\t', 6)
+        if len(cols) < 2: continue
         
+        owners = set()
+        for field in cols[:6]:
+            owners.update(acc for acc in parse_mitab_uniprot_ids(field) if acc in chaperone_accs)
+        if not owners: continue
+        
+        id_a = parse_psicquic_id(cols[0])
+        id_b = parse_psicquic_id(cols[1])
+        for owner in owners:
+            if id_a and id_a != owner: yield owner, id_a
+            if id_b and id_b != owner: yield owner, id_b
+
+def get_intact_interactions_batch(chaperone_accs):
+    """
+    Queries IntAct for a group of chaperones with a single MIQL query,
+    identifier:(ACC1 OR ACC2 ...), and splits the rows back per chaperone.
+    Returns {accession: [partners]}, or None if the query failed.
+    """
+    miql = "identifier:(" + " OR ".join(chaperone_accs) + ")"
+    intact_url = f"{INTACT_SEARCH_URL}/query/{miql}"
+    params = {"format": "tab25"}
+    
+    try:
+        if USE_PAGED_INTACT:
+            pairs = fetch_psicquic_paged(intact_url, params, lambda lines: iter_tab25_attributed(lines, chaperone_accs))
+        else:
+            pairs = set(iter_tab25_attributed(iter_remote_lines(intact_url, params), chaperone_accs))
+    except Exception as e:
+        print(f"  Error querying IntAct batch {chaperone_accs}: {e}")
+        return None
+    
+    targets = {acc: set() for acc in chaperone_accs}
+    for owner, partner in pairs:
+        targets[owner].add(partner)
+    return {acc: list(partners) for acc, partners in targets.items()}
+
+def intact_interactor_url(chaperone_acc):
+    return f"{INTACT_SEARCH_URL}/interactor/{chaperone_acc}"
+
+def fetch_intact_partners(chaperone_acc, ttl=None):
+    """
+    Queries IntAct via PSICQUIC web service for protein interactions.
+    Documentation: https://www.ebi.ac.uk/Tools/webservices/psicquic/intact/webservices/
+    Raises on failure instead of returning a partial result. ttl=0 bypasses fresh cache entries.
+    """
+    # Correct PSICQUIC endpoint for IntAct
+    intact_url = intact_interactor_url(chaperone_acc)
+    params = {"format": "tab25"}
+    
+    if USE_PAGED_INTACT:
+        targets = fetch_psicquic_paged(intact_url, params, lambda lines: iter_tab25_partners(lines, chaperone_acc), ttl=ttl)
+    else:
+        targets = set(iter_tab25_partners(iter_remote_lines(intact_url, params, ttl=ttl), chaperone_acc))
     return list(targets)
 
-def get_biogrid_interactions(chaperone_acc):
-    if not USE_BIOGRID or not BIOGRID_ACCESS_KEY or BIOGRID_ACCESS_KEY == "YOUR_ACCESS_KEY_HERE":
+def describe_intact_error(chaperone_acc, e):
+    if isinstance(e, requests.HTTPError) and e.response is not None:
+        return f"  Error: IntAct API returned status {e.response.status_code} for {chaperone_acc}"
+    return f"  Error querying IntAct for {chaperone_acc}: {e}"
+
+def get_intact_interactions(chaperone_acc):
+    """
+    Like fetch_intact_partners, but reports errors and returns an empty list.
+    """
+    try:
+        return fetch_intact_partners(chaperone_acc)
+    except Exception as e:
+        print(describe_intact_error(chaperone_acc, e))
+        return []
+
+_gene_map_lock = threading.Lock()
+
+def _load_gene_map():
+    try:
+        with open(GENE_MAP_FILE) as f:
+            gene_map = json.load(f)
+    except (OSError, ValueError):
+        gene_map = {}
+    if gene_map.get("version") != ACCESSION_MAP_VERSION:
+        gene_map = {"version": ACCESSION_MAP_VERSION, "accession_to_symbol": {}, "symbol_to_accession": {}}
+    return gene_map
+
+def map_gene_symbols(keys, direction):
+    """
+    Cached UniProt <-> gene symbol mapping for BioGRID. direction is "accession_to_symbol"
+    or "symbol_to_accession" (human Swiss-Prot entries). Keys missing from GENE_MAP_FILE
+    are mapped in one ID-mapping job; keys UniProt cannot map are cached as None.
+    The lock only covers the file; the job itself runs unlocked so chaperones can map concurrently.
+    """
+    with _gene_map_lock:
+        table = _load_gene_map()[direction]
+    missing = [key for key in keys if key not in table]
+    if not missing:
+        return {key: table[key] for key in keys}
+    
+    if direction == "accession_to_symbol":
+        job = run_idmapping_job(missing, "UniProtKB_AC-ID", "Gene_Name")
+    else:
+        job = run_idmapping_job(missing, "Gene_Name", "UniProtKB-Swiss-Prot", extra={"taxId": 9606})
+    mapped, _ = run_coroutine(job)
+    
+    with _gene_map_lock:
+        # Re-read: other threads may have added their own mappings in the meantime
+        gene_map = _load_gene_map()
+        table = gene_map[direction]
+        for key in missing:
+            table[key] = mapped.get(key)
+        with open(GENE_MAP_FILE, "w") as f:
+            json.dump(gene_map, f, indent=1, sort_keys=True)
+    return {key: table.get(key) for key in keys}
+
+def fetch_biogrid_paged(params):
+    """
+    All interaction records of a BioGRID query: the count comes first (format=count),
+    then pages of BIOGRID_PAGE_SIZE are fetched in parallel with start/max.
+    """
+    def fetch(page_params):
+        r = http_get(BIOGRID_URL, params=page_params)
+        if r.status_code != 200:
+            raise requests.HTTPError(f"status {r.status_code}", response=r)
+        return r
+    
+    total = int(fetch({**params, "format": "count"}).text.strip() or 0)
+    pages = [{**params, "format": "json", "start": start, "max": BIOGRID_PAGE_SIZE}
+             for start in range(0, total, BIOGRID_PAGE_SIZE)]
+    
+    records = []
+    with futures.ThreadPoolExecutor(max_workers=max(1, min(BIOGRID_PAGE_WORKERS, len(pages)))) as pool:
+        for r in pool.map(fetch, pages):
+            data = r.json()
+            # Results are keyed by interaction ID; an empty result may come back as a list
+            if isinstance(data, dict):
+                records.extend(data.values())
+    return records
+
+def iter_tab3_records(path):
+    """
+    Streams the rows of a BioGRID TAB3 release zip as {column: value} dicts, reading the
+    archive members directly (no extraction). In an ORGANISM archive only the
+    Homo_sapiens member is read.
+    """
+    with zipfile.ZipFile(path) as archive:
+        members = [m for m in archive.namelist() if m.endswith(".txt")]
+        human = [m for m in members if "Homo_sapiens" in m]
+        for member in human or members:
+            with archive.open(member) as raw:
+                lines = io.TextIOWrapper(raw, encoding="utf-8", errors="replace")
+                header = next(lines, "").lstrip("#").rstrip("\r\n").split("\t")
+                for line in lines:
+                    yield dict(zip(header, line.rstrip("\r\n").split("\t")))
+
+def get_biogrid_interactions_from_tab3(chaperone_accs, path=None):
+    """
+    Partners of every chaperone from a local BioGRID TAB3 archive, in one constant-memory pass.
+    Keeps human-human (and, with BIOGRID_PHYSICAL_ONLY, physical) interactions and matches
+    chaperones through the SWISS-PROT accession columns. Returns {accession: [partners]}.
+    """
+    path = path or BIOGRID_TAB3_FILE
+    print(f"Scanning {path} for {len(chaperone_accs)} chaperones...")
+    targets = {acc: set() for acc in chaperone_accs}
+    
+    def swissprot(value):
+        return [acc for acc in value.split("|") if acc and acc != "-"]
+    
+    for record in iter_tab3_records(path):
+        if record.get("Organism ID Interactor A") != "9606" or record.get("Organism ID Interactor B") != "9606":
+            continue
+        if BIOGRID_PHYSICAL_ONLY and record.get("Experimental System Type") != "physical":
+            continue
+        accs_a = swissprot(record.get("SWISS-PROT Accessions Interactor A", "-"))
+        accs_b = swissprot(record.get("SWISS-PROT Accessions Interactor B", "-"))
+        for owners, partners in ((accs_a, accs_b), (accs_b, accs_a)):
+            for owner in owners:
+                if owner in targets:
+                    targets[owner].update(p for p in partners if p != owner)
+    return {acc: list(partners) for acc, partners in targets.items()}
+
+def fetch_biogrid_partners(chaperone_acc):
+    """
+    Human interaction partners of a chaperone from the BioGRID REST service, as UniProt
+    accessions. The chaperone is searched by gene symbol; partner symbols are mapped
+    back to Swiss-Prot accessions through the cached gene symbol map.
+    Raises on failure instead of returning a partial result.
+    """
+    if not uses_biogrid_web():
+        return []
+    symbol = map_gene_symbols([chaperone_acc], "accession_to_symbol")[chaperone_acc]
+    if not symbol:
+        print(f"  BioGRID: no gene symbol for {chaperone_acc}")
         return []
-    targets = set()
-    url = "https://webservice.thebiogrid.org/interactions/"
+    
     params = {
         "accessKey": BIOGRID_ACCESS_KEY,
-        "format": "json",
         "searchNames": "true",
-        "geneList": chaperone_acc,
+        "geneList": symbol,
         "includeInteractors": "true",
+        "interSpeciesExcluded": "true",
+        "selfInteractionsExcluded": "true",
         "taxId": 9606 
     }
+    partner_symbols = set()
+    for record in fetch_biogrid_paged(params):
+        if BIOGRID_PHYSICAL_ONLY and record.get("EXPERIMENTAL_SYSTEM_TYPE") != "physical":
+            continue
+        if str(record.get("ORGANISM_A")) != "9606" or str(record.get("ORGANISM_B")) != "9606":
+            continue
+        symbol_a = str(record.get("OFFICIAL_SYMBOL_A", ""))
+        symbol_b = str(record.get("OFFICIAL_SYMBOL_B", ""))
+        if symbol_a.upper() == symbol.upper():
+            partner_symbols.add(symbol_b)
+        elif symbol_b.upper() == symbol.upper():
+            partner_symbols.add(symbol_a)
+    
+    accessions = map_gene_symbols(sorted(partner_symbols), "symbol_to_accession")
+    return list({acc for acc in accessions.values() if acc and acc != chaperone_acc})
+
+def get_biogrid_interactions(chaperone_acc):
+    """
+    Like fetch_biogrid_partners, but reports errors and returns an empty list.
+    """
     try:
-        r = requests.get(url, params=params)
-        if r.status_code == 200:
-            data = r.json()
-            # BioGRID logic placeholder
-            pass 
+        return fetch_biogrid_partners(chaperone_acc)
     except Exception as e:
         print(f"  BioGRID Error: {e}")
-    return list(targets)
+        return []
 
-def get_domains_batch(accession_list):
+def empty_domain_table():
+    return pd.DataFrame(columns=DOMAIN_COLUMNS)
+
+def domain_table_from_frame(df_parsed):
+    """
+    Converts a parsed UniProt TSV (Entry / Protein names / Pfam) into domain rows with
+    vectorized string ops: split the Pfam list, explode to one row per domain, and cut
+    protein names at the first "(".
+    """
+    if df_parsed.empty or "Pfam" not in df_parsed.columns:
+        return empty_domain_table()
+    
+    # SAFETY FIX: Force string conversion (missing values become "nan", as str() would)
+    pfam = df_parsed["Pfam"].astype(object).fillna("nan").astype(str)
+    names = df_parsed["Protein names"].astype(object).fillna("nan").astype(str) if "Protein names" in df_parsed.columns else pd.Series("Unknown", index=df_parsed.index)
+    target_ids = df_parsed["Entry"] if "Entry" in df_parsed.columns else pd.Series("", index=df_parsed.index)
+    
+    keep = (pfam != "") & (pfam.str.lower() != "nan")
+    table = pd.DataFrame({
+        "Target_ID": target_ids[keep],
+        "Target_Protein_Name": names[keep].str.partition("(")[0].str.strip(),
+        "Domain_ID": pfam[keep].str.split(";"),
+    }).explode("Domain_ID")
+    
+    table["Domain_ID"] = table["Domain_ID"].str.strip()
+    table = table[table["Domain_ID"].notna() & (table["Domain_ID"] != "")]
+    return table.reset_index(drop=True)
+
+def fetch_domain_chunk(chunk):
+    """
+    Pfam rows for one chunk of accessions via bioservices UniProt.search. Raises if UniProt could not be queried.
+    """
+    # Create proper query for UniProt REST API using parentheses for OR queries
+    query = "(" + " OR ".join([f"accession:{acc}" for acc in chunk]) + ")"
+    
+    # Use correct field names for UniProt REST API
+    df_res = uniprot_call(get_uniprot_client().search, query, columns="accession,protein_name,xref_pfam", frmt="tsv")
+    if isinstance(df_res, int):
+        raise RuntimeError(f"UniProt returned status {df_res}")
+    
+    # Parse TSV response
+    if not df_res:
+        return empty_domain_table()
+    # Convert TSV string to DataFrame
+    df_parsed = pd.read_csv(StringIO(df_res), sep='\t')
+    return domain_table_from_frame(df_parsed)
+
+def _stream_params(chunk):
+    return {
+        "query": "(" + " OR ".join(f"accession:{acc}" for acc in chunk) + ")",
+        "fields": "accession,protein_name,xref_pfam",
+        "format": "tsv",
+    }
+
+def stream_batches(accession_list):
+    """
+    Packs accessions into as few /stream requests as possible: each batch grows until the
+    encoded URL would exceed UNIPROT_MAX_URL_LENGTH or it holds UNIPROT_MAX_BATCH accessions.
+    """
+    base_length = len(UNIPROT_STREAM_URL) + 1 + len(urlencode(_stream_params([])))
+    batches, batch, length = [], [], base_length
+    for acc in accession_list:
+        # Each accession adds "accession:ACC" plus a " OR " separator, URL-encoded
+        added = len(urlencode({"q": f"accession:{acc} OR "})) - 2
+        if batch and (length + added > UNIPROT_MAX_URL_LENGTH or len(batch) >= UNIPROT_MAX_BATCH):
+            batches.append(batch)
+            batch, length = [], base_length
+        batch.append(acc)
+        length += added
+    if batch:
+        batches.append(batch)
+    return batches
+
+def fetch_domain_stream(chunk):
+    """
+    Pfam rows for a large batch of accessions from UniProt's /stream endpoint.
+    The gzip-encoded TSV is parsed incrementally, UNIPROT_TSV_CHUNK_ROWS rows at a time.
+    Raises if the request or the stream fails.
+    """
+    r = http_get(UNIPROT_STREAM_URL, params=_stream_params(chunk), stream=True)
+    with r:
+        if r.status_code != 200:
+            raise requests.HTTPError(f"status {r.status_code}", response=r)
+        r.raw.decode_content = True
+        tables = []
+        try:
+            for df_parsed in pd.read_csv(r.raw, sep='\t', dtype=str, chunksize=UNIPROT_TSV_CHUNK_ROWS):
+                tables.append(domain_table_from_frame(df_parsed))
+        except pd.errors.EmptyDataError:
+            pass
+    return pd.concat(tables, ignore_index=True) if tables else empty_domain_table()
+
+def get_domains_batch(accession_list, use_checkpoints=False):
+    """
+    Pfam domains for every accession, as a Target_ID/Target_Protein_Name/Domain_ID DataFrame.
+    With DOMAIN_SOURCE = "local" everything is answered from the pre-built domain index.
+    Otherwise accessions already in the domain store are answered locally; only misses go to UniProt.
+    Batches are fetched on a pool of DOMAIN_WORKERS threads, each retried independently,
+    and merged in batch order. With use_checkpoints, each finished batch is checkpointed
+    (keyed by its accessions) and batches finished by an earlier run are not fetched again.
+    """
     print(f"Retrieving domains for {len(accession_list)} unique targets...")
-    domain_data = []
+    if DOMAIN_SOURCE == "local":
+        return get_domains_from_index(accession_list)
+    tables = []
+    
+    store = None
+    if USE_DOMAIN_STORE:
+        store = open_domain_store()
+        requested = len(accession_list)
+        found, accession_list = store_lookup(store, list(accession_list))
+        tables.append(found)
+        print(f"  {requested - len(accession_list)} targets found in {DOMAIN_STORE_FILE}, {len(accession_list)} to fetch from UniProt")
+    
+    if USE_UNIPROT_STREAM:
+        chunks = stream_batches([x for x in accession_list if len(x) < 15])
+        fetch = fetch_domain_stream
+    else:
+        chunk_size = 20
+        chunks = [accession_list[i:i+chunk_size] for i in range(0, len(accession_list), chunk_size)]
+        chunks = [[x for x in chunk if len(x) < 15] for chunk in chunks]
+        fetch = fetch_domain_chunk
     
-    chunk_size = 20
-    for i in range(0, len(accession_list), chunk_size):
-        chunk = accession_list[i:i+chunk_size]
-        chunk = [x for x in chunk if len(x) < 15]
-        if not chunk: continue
+    def fetch_with_retries(chunk):
+        for attempt in range(DOMAIN_CHUNK_RETRIES + 1):
+            try:
+                return fetch(chunk)
+            except body_read_errors() as e:
+                if attempt == DOMAIN_CHUNK_RETRIES:
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"  Retrying batch {chunk[0]}..{chunk[-1]} in {delay:.1f}s ({e})")
+                time.sleep(delay)
+    
+    chunks = [chunk for chunk in chunks if chunk]
+    results = [None] * len(chunks)
+    pending = []
+    for idx, chunk in enumerate(chunks):
+        key = hashlib.sha1(",".join(chunk).encode("utf-8")).hexdigest()
+        saved = load_checkpoint("domains", key) if use_checkpoints else None
+        if saved is not None:
+            results[idx] = pd.DataFrame(saved, columns=DOMAIN_COLUMNS)
+        else:
+            pending.append((idx, chunk, key))
+    
+    if pending:
+        with futures.ThreadPoolExecutor(max_workers=max(1, min(DOMAIN_WORKERS, len(pending)))) as pool:
+            pending_futures = {pool.submit(fetch_with_retries, chunk): (idx, chunk, key) for idx, chunk, key in pending}
+            for future in futures.as_completed(pending_futures):
+                idx, chunk, key = pending_futures[future]
+                try:
+                    table = future.result()
+                except Exception as e:
+                    print(f"  Error fetching batch {chunk[0]}..{chunk[-1]} ({len(chunk)} accessions): {e}")
+                    continue
+                if use_checkpoints:
+                    save_checkpoint("domains", key, table.to_dict("list"))
+                if store is not None:
+                    store_save(store, chunk, table)
+                results[idx] = table
+    
+    tables.extend(table for table in results if table is not None)
+    
+    if store is not None:
+        store.close()
+    tables = [table for table in tables if not table.empty]
+    return pd.concat(tables, ignore_index=True) if tables else empty_domain_table()
 
-        # Create proper query for UniProt REST API using parentheses for OR queries
-        query = "(" + " OR ".join([f"accession:{acc}" for acc in chunk]) + ")"
+def mine_chaperone(name, acc, intact_partners=None, ttl=None, biogrid_partners=None):
+    """
+    Collects the interaction rows for a single chaperone (IntAct + optional BioGRID).
+    intact_partners / biogrid_partners may carry partners already fetched by a batched
+    query or read from an offline source.
+    A partner found in both sources gets a single row with Source "IntAct;BioGRID".
+    Returns None if IntAct or BioGRID could not be queried, so the chaperone is not marked complete.
+    """
+    print(f"  Processing {name} ({acc})...")
+    
+    # Ensure 'acc' is a string before passing
+    if not isinstance(acc, str):
+        print(f"    Skipping {name}: Invalid accession format {acc}")
+        return []
         
+    if intact_partners is None:
         try:
-            # Use correct field names for UniProt REST API
-            df_res = u.search(query, columns="accession,protein_name,xref_pfam", frmt="tsv")
-            
-            # Parse TSV response
-            if df_res:
-                # Convert TSV string to DataFrame
-                from io import StringIO
-                df_parsed = pd.read_csv(StringIO(df_res), sep='\t')
-                
-                if not df_parsed.empty:
-                    for _, row in df_parsed.iterrows():
-                        target_id = row.get("Entry", "")
-                        # SAFETY FIX: Force string conversion
-                        target_name = str(row.get("Protein names", "Unknown"))
-                        pfam_entry = str(row.get("Pfam", ""))
-                        
-                        if not pfam_entry or pfam_entry.lower() == "nan" or pfam_entry == "":
-                            continue
-                        
-                        pfams = [x.strip() for x in pfam_entry.split(";") if x.strip()]
-                        
-                        for pfam_id in pfams:
-                            domain_data.append({
-                                "Target_ID": target_id,
-                                "Target_Protein_Name": target_name.split("(")[0].strip(),
-                                "Domain_ID": pfam_id
-                            })
+            partners = fetch_intact_partners(acc, ttl=ttl)
         except Exception as e:
-            print(f"  Error fetching batch {i}-{i+chunk_size}: {e}")
-            
-    return pd.DataFrame(domain_data)
+            print(describe_intact_error(acc, e))
+            return None
+    else:
+        partners = list(intact_partners)
+    print(f"    Found {len(partners)} partners in IntAct ({name})")
+    
+    sources = [("IntAct", partners)]
+    if USE_BIOGRID:
+        if biogrid_partners is None:
+            try:
+                bg_partners = fetch_biogrid_partners(acc)
+            except Exception as e:
+                print(f"  BioGRID Error for {acc}: {e}")
+                return None
+        else:
+            bg_partners = list(biogrid_partners)
+        if bg_partners:
+            print(f"    Found {len(bg_partners)} partners in BioGRID ({name})")
+            sources.append(("BioGRID", bg_partners))
+    
+    # One row per partner, so a pair reported by both databases is not counted twice downstream
+    partner_sources = {}
+    for source, source_partners in sources:
+        for partner in source_partners:
+            if partner != acc and source not in partner_sources.setdefault(partner, []):
+                partner_sources[partner].append(source)
+    
+    rows = []
+    for partner, found_in in partner_sources.items():
+        rows.append({
+            "Chaperone_Name": name,
+            "Chaperone_ID": acc,
+            "Target_ID": partner,
+            "Source": ";".join(found_in)
+        })
+    return rows
+
+def mine_chaperone_group(group, use_checkpoints=False, source_partners=None):
+    """
+    Mines a list of (name, accession) pairs. In batched mode IntAct is queried once for
+    the whole group; if that fails, each chaperone falls back to its own query.
+    source_partners ({"IntAct"/"BioGRID": {accession: partners}}, read from offline sources)
+    replaces the corresponding web queries.
+    With use_checkpoints, chaperones finished by an earlier run are loaded from their
+    checkpoint and each newly finished chaperone is checkpointed straight away.
+    """
+    done = {}
+    if use_checkpoints:
+        for name, _ in group:
+            saved = load_checkpoint("interactions", name)
+            if saved is not None:
+                done[name] = saved
+    
+    offline = source_partners or {}
+    batch = offline.get("IntAct")
+    biogrid = offline.get("BioGRID")
+    accs = [acc for name, acc in group if isinstance(acc, str) and name not in done]
+    if batch is None and USE_BATCHED_INTACT and len(accs) > 1:
+        batch = get_intact_interactions_batch(accs)
+    
+    rows = []
+    for name, acc in group:
+        if name in done:
+            rows.extend(done[name])
+            continue
+        chap_rows = mine_chaperone(name, acc, batch.get(acc) if batch is not None else None,
+                                   biogrid_partners=biogrid.get(acc) if biogrid is not None else None)
+        if chap_rows is None:
+            continue
+        if use_checkpoints:
+            save_checkpoint("interactions", name, chap_rows)
+        rows.extend(chap_rows)
+    return rows
+
+def uses_offline_sources():
+    return INTACT_SOURCE == "dump" or (USE_BIOGRID and BIOGRID_SOURCE == "tab3")
+
+def uses_biogrid_web():
+    return USE_BIOGRID and BIOGRID_SOURCE == "web" and BIOGRID_ACCESS_KEY and BIOGRID_ACCESS_KEY != "YOUR_ACCESS_KEY_HERE"
+
+def load_source_partners(chap_map):
+    """
+    Partners for every chaperone from the offline sources in use (one pass per file),
+    as {"IntAct"/"BioGRID": {accession: partners}}. Sources in "web" mode are left out;
+    for BioGRID over the web, the chaperones' gene symbols are mapped here in a single job,
+    so the per-chaperone searches find them in the cache.
+    """
+    accs = [acc for acc in chap_map.values() if isinstance(acc, str)]
+    if uses_biogrid_web() and accs:
+        try:
+            map_gene_symbols(accs, "accession_to_symbol")
+        except Exception as e:
+            # Not fatal: each chaperone retries its own mapping
+            print(f"  BioGRID: could not map gene symbols up front ({e})")
+    offline = {}
+    if INTACT_SOURCE == "dump":
+        offline["IntAct"] = get_intact_interactions_from_dump(accs)
+    if USE_BIOGRID and BIOGRID_SOURCE == "tab3":
+        offline["BioGRID"] = get_biogrid_interactions_from_tab3(accs)
+    return offline
+
+def chaperone_groups(chap_map):
+    items = list(chap_map.items())
+    size = INTACT_BATCH_SIZE if USE_BATCHED_INTACT else 1
+    return [items[i:i+size] for i in range(0, len(items), size)]
+
+async def mine_interactions_async(chap_map, max_concurrency=None, use_checkpoints=False, semaphore=None):
+    """
+    Mines all chaperones in chap_map concurrently.
+    Blocking fetchers run in worker threads; a semaphore caps requests in flight
+    (pass one in to share the cap with other mining calls in the same event loop).
+    max_concurrency defaults to MAX_CONCURRENCY as set at call time.
+    Returns the same interaction rows, in the same order, as the sequential loop.
+    """
+    if max_concurrency is None:
+        max_concurrency = MAX_CONCURRENCY
+    semaphore = semaphore or asyncio.Semaphore(max(1, max_concurrency))
+    try:
+        source_partners = await asyncio.to_thread(load_source_partners, chap_map)
+    except Exception as e:
+        print(f"  Error reading offline interaction source: {e}")
+        return []
+    
+    async def run_one(group):
+        async with semaphore:
+            return await asyncio.to_thread(mine_chaperone_group, group, use_checkpoints, source_partners)
+    
+    results = await asyncio.gather(*(run_one(group) for group in chaperone_groups(chap_map)))
+    return [row for rows in results for row in rows]
+
+async def mine_chaperone_names_async(gene_names, max_concurrency=None, use_checkpoints=False):
+    """
+    Maps entry names and mines their interactions in one event loop: chaperones already
+    in the mapping cache start mining immediately, while the ID-mapping job for the
+    remaining names is polled alongside. Returns (chap_map, interaction rows), both in
+    gene_names order.
+    """
+    cached = load_accession_map()
+    known = {name: cached[name]["accession"] for name in gene_names if name in cached}
+    missing = [name for name in gene_names if name not in cached]
+    print(f"{len(known)} chaperones resolved from {ACCESSION_MAP_FILE}, {len(missing)} to map")
+    
+    async def map_missing(names):
+        try:
+            return await map_accessions_async(names)
+        except Exception as e:
+            print(f"  Error mapping chaperone names: {e}")
+            return {}
+    
+    if uses_offline_sources() and missing:
+        # A single pass over each offline file serves every chaperone, so finish the mapping first
+        known.update(await map_missing(missing))
+        missing = []
+    
+    # Both mining calls draw from one semaphore, so together they stay within max_concurrency
+    if max_concurrency is None:
+        max_concurrency = MAX_CONCURRENCY
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    
+    async def map_then_mine():
+        if not missing:
+            return {}, []
+        new_map = await map_missing(missing)
+        return new_map, await mine_interactions_async(new_map, use_checkpoints=use_checkpoints, semaphore=semaphore)
+    
+    known_rows, (new_map, new_rows) = await asyncio.gather(
+        mine_interactions_async(known, use_checkpoints=use_checkpoints, semaphore=semaphore), map_then_mine())
+    
+    merged = {**known, **new_map}
+    chap_map = {name: merged[name] for name in gene_names if name in merged}
+    rows_by_name = {}
+    for row in known_rows + new_rows:
+        rows_by_name.setdefault(row["Chaperone_Name"], []).append(row)
+    return chap_map, [row for name in chap_map for row in rows_by_name.get(name, [])]
+
+def mine_interactions(chap_map, use_checkpoints=False):
+    if USE_ASYNC:
+        return run_coroutine(mine_interactions_async(chap_map, use_checkpoints=use_checkpoints))
+    try:
+        source_partners = load_source_partners(chap_map)
+    except Exception as e:
+        print(f"  Error reading offline interaction source: {e}")
+        return []
+    interaction_data = []
+    for group in chaperone_groups(chap_map):
+        interaction_data.extend(mine_chaperone_group(group, use_checkpoints, source_partners))
+    return interaction_data
+
+# ==========================================
+# OUTPUT TABLES
+# ==========================================
+_output_format = None
+
+def output_format():
+    """
+    OUTPUT_FORMAT, falling back to CSV (with a warning, once) when pyarrow is not installed.
+    """
+    global _output_format
+    if _output_format is None:
+        _output_format = OUTPUT_FORMAT
+        if OUTPUT_FORMAT == "parquet" and importlib.util.find_spec("pyarrow") is None:
+            print("Warning: OUTPUT_FORMAT = \"parquet\" needs pyarrow, which is not installed. Writing CSV instead.")
+            _output_format = "csv"
+    return _output_format
+
+def table_path(path):
+    """
+    One of INTERACTIONS_FILE / DOMAINS_FILE / MASTER_FILE with the extension of the output format.
+    """
+    return os.path.splitext(path)[0] + "." + output_format()
+
+def write_table(df, path):
+    """
+    Writes an output table in the configured format and returns the path written.
+    For Parquet, string columns are stored as dictionaries (each distinct ID once per row group).
+    """
+    path = table_path(path)
+    if output_format() == "parquet":
+        df = df.astype({col: "category" for col in df.columns if df[col].dtype == object or pd.api.types.is_string_dtype(df[col])})
+        df.to_parquet(path, index=False, compression=PARQUET_COMPRESSION)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+def read_table(path, columns=None):
+    """
+    Reads an output table written by write_table, optionally only some of its columns.
+    """
+    path = table_path(path)
+    if path.endswith(".parquet"):
+        df = pd.read_parquet(path, columns=columns)
+        # Back to plain strings, so concat/merge with freshly mined rows behave as with CSV
+        return df.astype({col: df[col].cat.categories.dtype for col in df.columns if isinstance(df[col].dtype, pd.CategoricalDtype)})
+    return pd.read_csv(path, usecols=columns)
+
+def shared_categories(*columns):
+    """
+    One CategoricalDtype over the values of several columns, so that a join on them
+    compares integer codes instead of strings.
+    """
+    values = pd.concat([pd.Series(col.unique()) for col in columns], ignore_index=True)
+    return pd.CategoricalDtype(values.dropna().unique())
+
+def encode_tables(df_interactions, df_domains):
+    """
+    Categorical versions of the interaction and domain tables: every string column is stored
+    once per distinct value plus small integer codes, and Target_ID uses one vocabulary in both
+    tables. Strings only come back when the tables are written.
+    """
+    target_dtype = shared_categories(df_interactions["Target_ID"], df_domains["Target_ID"])
+    
+    def encode(df):
+        return df.astype({col: target_dtype if col == "Target_ID" else "category"
+                          for col in df.columns if col == "Target_ID" or df[col].dtype == object or pd.api.types.is_string_dtype(df[col])})
+    return encode(df_interactions), encode(df_domains)
+
+# ==========================================
+# INCREMENTAL REFRESH
+# ==========================================
+def partner_digest(rows):
+    partners = sorted({row["Target_ID"] for row in rows})
+    return hashlib.sha256("\n".join(partners).encode("utf-8")).hexdigest()
+
+def load_refresh_state():
+    try:
+        with open(REFRESH_STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_refresh_state(state):
+    with open(REFRESH_STATE_FILE, "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+
+def record_refresh_state(chap_map, interaction_data, state=None):
+    """
+    Stores the IntAct interaction count and a digest of the partner set of every chaperone
+    that was mined completely (has an interactions checkpoint). Chaperones that failed are
+    left out, so the next --refresh sees them as changed and fetches them again.
+    With per-chaperone paged queries the counts are already in the response cache; in other
+    modes (batched, unpaged) they cost one count request per chaperone, made concurrently.
+    """
+    state = dict(state or {})
+    rows_by_name = {}
+    for row in interaction_data:
+        rows_by_name.setdefault(row["Chaperone_Name"], []).append(row)
+    
+    def count(item):
+        name, acc = item
+        try:
+            return name, acc, get_psicquic_count(intact_interactor_url(acc), {"format": "tab25"})
+        except Exception as e:
+            print(f"  Could not record IntAct count for {name}: {e}")
+            return name, acc, None
+    
+    items = [(name, acc) for name, acc in chap_map.items()
+             if isinstance(acc, str) and load_checkpoint("interactions", name) is not None]
+    with futures.ThreadPoolExecutor(max_workers=max(1, MAX_CONCURRENCY)) as pool:
+        for name, acc, n in pool.map(count, items):
+            if n is None:
+                state.pop(name, None)
+                continue
+            state[name] = {"accession": acc, "count": n, "partners_sha256": partner_digest(rows_by_name.get(name, []))}
+    save_refresh_state(state)
+
+def find_changed_chaperones(chap_map, state):
+    """
+    Asks IntAct for every chaperone's current interaction count (bypassing the cache) and
+    returns {name: (accession, count)} for those whose count differs from the stored state.
+    """
+    def check(item):
+        name, acc = item
+        try:
+            return name, acc, get_psicquic_count(intact_interactor_url(acc), {"format": "tab25"}, ttl=0)
+        except Exception as e:
+            print(f"  Could not check {name}: {e}")
+            return name, acc, None
+    
+    items = [(name, acc) for name, acc in chap_map.items() if isinstance(acc, str)]
+    changed = {}
+    with futures.ThreadPoolExecutor(max_workers=max(1, MAX_CONCURRENCY)) as pool:
+        for name, acc, count in pool.map(check, items):
+            prev = state.get(name)
+            if count is None:
+                continue
+            if prev and prev["accession"] == acc and prev["count"] == count:
+                continue
+            changed[name] = (acc, count)
+    return changed
+
+def refresh(chap_map):
+    """
+    Delta refresh of existing output files: re-downloads only chaperones whose IntAct count
+    changed, looks up domains only for targets not already in DOMAINS_FILE, and patches the
+    interaction and master tables in place.
+    """
+    if INTACT_SOURCE == "dump":
+        print(f"Error: --refresh checks live IntAct counts and cannot be used with INTACT_SOURCE = \"dump\".")
+        print(f"Run a full pass instead; it re-scans '{INTACT_DUMP_FILE}' in one go.")
+        return
+    
+    for path in (INTERACTIONS_FILE, DOMAINS_FILE, MASTER_FILE):
+        if not os.path.exists(table_path(path)):
+            print(f"Error: '{table_path(path)}' not found. Run a full mining pass before --refresh.")
+            return
+    
+    state = load_refresh_state()
+    if not state:
+        print(f"Note: '{REFRESH_STATE_FILE}' not found; every chaperone will be re-downloaded once.")
+    
+    print("\nChecking IntAct interaction counts...")
+    changed = find_changed_chaperones(chap_map, state)
+    if not changed:
+        print("No chaperone changed since the last run. Nothing to do.")
+        return
+    print(f"{len(changed)} chaperones changed: {', '.join(changed)}")
+    
+    # Offline sources (e.g. a BioGRID TAB3 archive) are read once for the changed chaperones;
+    # without them a re-mined chaperone would lose its offline rows
+    try:
+        offline = load_source_partners({name: acc for name, (acc, _) in changed.items()})
+    except Exception as e:
+        print(f"  Error reading offline interaction source: {e}")
+        return
+    
+    intact, biogrid = offline.get("IntAct"), offline.get("BioGRID")
+    
+    def remine(item):
+        name, (acc, _) = item
+        return name, mine_chaperone(name, acc, intact.get(acc) if intact is not None else None, ttl=0,
+                                    biogrid_partners=biogrid.get(acc) if biogrid is not None else None)
+    
+    new_rows = {}
+    with futures.ThreadPoolExecutor(max_workers=max(1, MAX_CONCURRENCY)) as pool:
+        for name, rows in pool.map(remine, changed.items()):
+            if rows is None:
+                continue
+            if state.get(name, {}).get("partners_sha256") == partner_digest(rows):
+                # Count moved but the partner set did not (e.g. new evidence for known pairs)
+                state[name]["count"] = changed[name][1]
+                continue
+            new_rows[name] = rows
+    
+    if not new_rows:
+        save_refresh_state(state)
+        print("Partner sets are unchanged. Nothing to patch.")
+        return
+    
+    patched = list(new_rows)
+    df_interactions = read_table(INTERACTIONS_FILE)
+    # Targets of the previous run were all looked up then, including those without Pfam rows
+    # (which never reach DOMAINS_FILE), so only partners absent from it are new
+    known_targets = set(df_interactions["Target_ID"])
+    df_new = pd.DataFrame([row for rows in new_rows.values() for row in rows])
+    df_interactions = pd.concat([df_interactions[~df_interactions["Chaperone_Name"].isin(patched)], df_new], ignore_index=True)
+    
+    df_domains = read_table(DOMAINS_FILE)
+    new_targets = sorted(set(df_new["Target_ID"]) - known_targets) if not df_new.empty else []
+    if new_targets:
+        df_domains = pd.concat([df_domains, get_domains_batch(new_targets)], ignore_index=True)
+    
+    df_master = read_table(MASTER_FILE)
+    if not df_new.empty:
+        df_master_new = pd.merge(df_new, df_domains, on="Target_ID", how="inner")
+        df_master_new["Interaction_Label"] = 1
+        df_master_new = df_master_new[[c for c in df_master.columns if c in df_master_new.columns]]
+    else:
+        df_master_new = df_master.iloc[0:0]
+    df_master = pd.concat([df_master[~df_master["Chaperone_Name"].isin(patched)], df_master_new], ignore_index=True)
+    
+    # Keep chaperones in CHAPERONE_LIST order, as a full run would write them
+    order = {name: i for i, name in enumerate(chap_map)}
+    df_interactions = df_interactions.sort_values("Chaperone_Name", key=lambda c: c.map(order), kind="stable")
+    df_master = df_master.sort_values("Chaperone_Name", key=lambda c: c.map(order), kind="stable")
+    
+    write_table(df_interactions, INTERACTIONS_FILE)
+    write_table(df_domains, DOMAINS_FILE)
+    write_table(df_master, MASTER_FILE)
+    
+    for name, rows in new_rows.items():
+        state[name] = {"accession": changed[name][0], "count": changed[name][1], "partners_sha256": partner_digest(rows)}
+    save_refresh_state(state)
+    
+    print(f"--- REFRESHED ---")
+    print(f"Patched {len(patched)} chaperones, {len(new_targets)} new targets looked up")
+    print(f"Total Rows: {len(df_master)}")
 
 # ==========================================
 # MAIN EXECUTION
 # ==========================================
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mine chaperone interaction partners and their Pfam domains.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--resume", action="store_true",
+                      help=f"continue an interrupted run from the checkpoints in '{CHECKPOINT_DIR}/', skipping completed chaperones and domain batches")
+    mode.add_argument("--refresh", action="store_true",
+                      help="re-download only chaperones whose IntAct interaction count changed and patch the existing output files (needs INTACT_SOURCE = \"web\")")
+    mode.add_argument("--build-domain-index", metavar="DUMP",
+                      help=f"index a Pfam-A.regions or UniProt TSV dump into '{DOMAIN_INDEX_FILE}' for DOMAIN_SOURCE = \"local\", then exit")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
     print("--- Starting Chaperone Domain Miner ---")
     
-    chap_map = get_uniprot_accessions(CHAPERONE_LIST)
-    interaction_data = []
-    all_targets = set()
+    if args.build_domain_index:
+        build_domain_index(args.build_domain_index)
+        return
     
-    print("\nMining interactions...")
-    for name, acc in chap_map.items():
-        print(f"  Processing {name} ({acc})...")
-        
-        # Ensure 'acc' is a string before passing
-        if not isinstance(acc, str):
-            print(f"    Skipping {name}: Invalid accession format {acc}")
-            continue
-            
-        partners = get_intact_interactions(acc)
-        print(f"    Found {len(partners)} partners in IntAct")
-        
-        if USE_BIOGRID:
-             bg_partners = get_biogrid_interactions(acc)
-             if bg_partners:
-                partners.extend(bg_partners)
-            
-        for partner in partners:
-            if partner != acc: 
-                interaction_data.append({
-                    "Chaperone_Name": name,
-                    "Chaperone_ID": acc,
-                    "Target_ID": partner,
-                    "Source": "IntAct"
-                })
-                all_targets.add(partner)
+    if args.refresh:
+        refresh(get_uniprot_accessions(CHAPERONE_LIST))
+        return
+    
+    if args.resume:
+        print(f"Resuming from checkpoints in {CHECKPOINT_DIR}/")
+    else:
+        clear_checkpoints()
+    
+    if USE_ASYNC:
+        # Mapping of new names and mining of already-mapped chaperones overlap
+        print("\nMapping names and mining interactions...")
+        chap_map, interaction_data = asyncio.run(mine_chaperone_names_async(CHAPERONE_LIST, use_checkpoints=True))
+    else:
+        chap_map = get_uniprot_accessions(CHAPERONE_LIST)
+        print("\nMining interactions...")
+        interaction_data = mine_interactions(chap_map, use_checkpoints=True)
+    all_targets = {row["Target_ID"] for row in interaction_data}
+    
+    unmapped = [name for name in CHAPERONE_LIST if name not in chap_map]
+    if unmapped:
+        print(f"\nWarning: {len(unmapped)} chaperone names could not be mapped to UniProt ({', '.join(unmapped)}). They were not mined.")
+    
+    failed = [name for name in chap_map if load_checkpoint("interactions", name) is None]
+    if failed:
+        print(f"\nWarning: {len(failed)} chaperones could not be mined ({', '.join(failed)}). Re-run with --resume to retry them.")
 
     df_interactions = pd.DataFrame(interaction_data)
     if df_interactions.empty:
         print("\nNo interactions found. Exiting.")
         return
 
-    df_interactions.to_csv(INTERACTIONS_FILE, index=False)
-    print(f"\nSaved {len(df_interactions)} interactions to {INTERACTIONS_FILE}")
+    interactions_path = write_table(df_interactions, INTERACTIONS_FILE)
+    print(f"\nSaved {len(df_interactions)} interactions to {interactions_path}")
 
-    unique_targets = list(all_targets)
-    df_domains = get_domains_batch(unique_targets)
+    # Sorted so that domain batches (and their checkpoints) are identical across runs
+    unique_targets = sorted(all_targets)
+    df_domains = get_domains_batch(unique_targets, use_checkpoints=True)
     
     if df_domains.empty:
         print("No domain information found for targets.")
         return
 
-    df_domains.to_csv(DOMAINS_FILE, index=False)
-    print(f"Saved domain info to {DOMAINS_FILE}")
+    domains_path = write_table(df_domains, DOMAINS_FILE)
+    print(f"Saved domain info to {domains_path}")
     
     print("\nMerging data...")
+    df_interactions, df_domains = encode_tables(df_interactions, df_domains)
     df_master = pd.merge(df_interactions, df_domains, on="Target_ID", how="inner")
     df_master["Interaction_Label"] = 1
     
@@ -244,10 +1761,18 @@ def main():
     cols = [c for c in cols if c in df_master.columns]
     
     df_master = df_master[cols]
-    df_master.to_csv(MASTER_FILE, index=False)
+    master_path = write_table(df_master, MASTER_FILE)
+    
+    if INTACT_SOURCE == "dump":
+        # --refresh compares against live IntAct counts, which an offline run must not fetch
+        print(f"Offline IntAct source: not recording {REFRESH_STATE_FILE}")
+    else:
+        record_refresh_state(chap_map, interaction_data)
     
+    if USE_HTTP_CACHE:
+        print(f"HTTP cache: {CACHE_STATS['hits']} hits, {CACHE_STATS['misses']} misses, {CACHE_STATS['revalidated']} revalidated")
     print(f"--- SUCCESS ---")
-    print(f"Master dataset created: {MASTER_FILE}")
+    print(f"Master dataset created: {master_path}")
     print(f"Total Rows: {len(df_master)}")
 
 if __name__ == "__main__":
@@ -1,61 +1,493 @@
+import argparse
+import hashlib
+import numpy as np
 import pandas as pd
 import os
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from scipy import sparse, special
 
 # Configuration
 MASTER_FILE = "chaperone_domain_analysis_master.csv"
+MASTER_FORMATS = [".parquet", ".csv"]  # looked for next to MASTER_FILE; the newest one wins
+ANALYSIS_COLUMNS = ["Chaperone_Name", "Target_ID", "Domain_ID"]
+TOP_K = 15
 
-def analyze_preferences():
+# Count matrices are cached next to the master file and rebuilt when its contents change
+MATRIX_CACHE_SUFFIX = ".matrices.npz"
+MATRIX_CACHE_VERSION = 1  # bump when the layout of the cached matrices changes
+MATRIX_NAMES = ["chaperone_domain", "chaperone_target", "target_domain"]
+VOCABULARY_NAMES = ["chaperones", "targets", "domains"]
+
+# Enrichment mode (--enrichment): domains reported per chaperone at this Benjamini-Hochberg FDR
+ENRICHMENT_FDR = 0.05
+
+# Permutation mode (--permutations N): targets are relabelled at random, keeping each target's domain set
+PERMUTATION_BATCH = 50  # permutations per stacked sparse product (one task for a worker process)
+PERMUTATION_WORKERS = os.cpu_count() or 1
+PERMUTATION_SEED = 20240101  # same seed and N give the same p-values, whatever the number of workers
+
+def find_master_file():
+    """
+    The most recently written master table (Parquet or CSV), or None if there is none.
+    """
+    root = os.path.splitext(MASTER_FILE)[0]
+    candidates = [root + ext for ext in MASTER_FORMATS if os.path.exists(root + ext)]
+    if not candidates:
+        return None
+    return max(candidates, key=os.path.getmtime)
+
+def load_master(path, columns=ANALYSIS_COLUMNS):
+    """
+    Loads only the columns the analysis needs; Parquet reads skip the other columns entirely.
+    Strings are kept as categoricals (one copy per distinct name plus integer codes).
+    """
+    if path.endswith(".parquet"):
+        # Dictionary-encoded columns already come back as categoricals
+        return pd.read_parquet(path, columns=columns)
+    return pd.read_csv(path, usecols=columns, dtype="category")
+
+# ==========================================
+# COUNT MATRICES
+# ==========================================
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def pair_counts(row_codes, col_codes, shape):
+    """
+    CSR matrix of how often each (row, column) code pair occurs; pairs with a missing code (-1) are skipped.
+    Within each row the columns are kept in order of first appearance rather than sorted,
+    so that ties can be listed the way value_counts lists them.
+    """
+    keep = (row_codes >= 0) & (col_codes >= 0)
+    pairs = pd.DataFrame({"row": row_codes[keep], "col": col_codes[keep]})
+    counts = pairs.groupby(["row", "col"], sort=False).size().reset_index(name="count")
+    counts = counts.sort_values("row", kind="stable")
+    indptr = np.concatenate([[0], np.cumsum(np.bincount(counts["row"], minlength=shape[0]))])
+    return sparse.csr_array((counts["count"].to_numpy(np.int32), counts["col"].to_numpy(np.int32), indptr), shape=shape)
+
+def build_count_matrices(df):
+    """
+    Count matrices of a master table, with vocabularies in order of first appearance:
+      chaperone_domain  rows per (chaperone, domain), the counts behind the preference report
+      chaperone_target  rows per (chaperone, target)
+      target_domain     1 where a target carries a domain
+    """
+    chap_codes, chaperones = pd.factorize(df['Chaperone_Name'])
+    target_codes, targets = pd.factorize(df['Target_ID'])
+    domain_codes, domains = pd.factorize(df['Domain_ID'])
+    n_chaps, n_targets, n_domains = len(chaperones), len(targets), len(domains)
+
+    target_domain = pair_counts(target_codes, domain_codes, (n_targets, n_domains))
+    target_domain.data[:] = 1
+    return {
+        "chaperones": np.asarray(chaperones, dtype=str),
+        "targets": np.asarray(targets, dtype=str),
+        "domains": np.asarray(domains, dtype=str),
+        "total_rows": len(df),
+        # Includes rows without a domain, as the report's totals always have
+        "chaperone_rows": np.bincount(chap_codes[chap_codes >= 0], minlength=n_chaps),
+        "chaperone_domain": pair_counts(chap_codes, domain_codes, (n_chaps, n_domains)),
+        "chaperone_target": pair_counts(chap_codes, target_codes, (n_chaps, n_targets)),
+        "target_domain": target_domain,
+    }
+
+def save_count_matrices(path, matrices, digest):
+    arrays = {"version": np.array(MATRIX_CACHE_VERSION), "master_sha256": np.array(digest),
+              "total_rows": np.array(matrices["total_rows"]), "chaperone_rows": matrices["chaperone_rows"]}
+    for name in VOCABULARY_NAMES:
+        arrays[name] = matrices[name]
+    for name in MATRIX_NAMES:
+        m = matrices[name]
+        arrays.update({f"{name}_data": m.data, f"{name}_indices": m.indices,
+                       f"{name}_indptr": m.indptr, f"{name}_shape": np.array(m.shape)})
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, path)
+
+def read_count_matrices(path, digest):
+    """
+    The cached matrices if `path` holds them for a master file with this digest, else None.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path, allow_pickle=False) as z:
+            if int(z["version"]) != MATRIX_CACHE_VERSION or str(z["master_sha256"]) != digest:
+                return None
+            matrices = {name: z[name] for name in VOCABULARY_NAMES}
+            matrices["total_rows"] = int(z["total_rows"])
+            matrices["chaperone_rows"] = z["chaperone_rows"]
+            for name in MATRIX_NAMES:
+                matrices[name] = sparse.csr_array((z[f"{name}_data"], z[f"{name}_indices"], z[f"{name}_indptr"]),
+                                                  shape=tuple(z[f"{name}_shape"]))
+            return matrices
+    except (OSError, KeyError, ValueError) as e:
+        print(f"Warning: ignoring unreadable matrix cache '{path}': {e}")
+        return None
+
+def load_count_matrices(master_file):
+    """
+    Count matrices of the master file, from the .npz cache when it was built from the same contents.
+    """
+    cache_path = os.path.splitext(master_file)[0] + MATRIX_CACHE_SUFFIX
+    digest = file_sha256(master_file)
+    matrices = read_count_matrices(cache_path, digest)
+    if matrices is not None:
+        print(f"Using cached count matrices from {cache_path}")
+        return matrices
+
+    print(f"Loading {master_file}...")
+    matrices = build_count_matrices(load_master(master_file))
+    save_count_matrices(cache_path, matrices, digest)
+    print(f"Cached count matrices in {cache_path}")
+    return matrices
+
+def top_domains(matrices, k=TOP_K):
+    """
+    For each chaperone code, the codes and counts of its k most frequent domains,
+    ties in order of first appearance (as value_counts would list them).
+    """
+    counts = matrices["chaperone_domain"]
+    rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+    # lexsort is stable, so ties keep the first-appearance order of the row's columns
+    order = np.lexsort((-counts.data, rows))
+    rank = np.arange(len(order)) - counts.indptr[rows[order]]
+    order = order[rank < k]
+    bounds = np.searchsorted(rows[order], np.arange(counts.shape[0] + 1))
+    return {chap: (counts.indices[order[start:end]], counts.data[order[start:end]])
+            for chap, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]))}
+
+# ==========================================
+# ENRICHMENT
+# ==========================================
+def benjamini_hochberg(p_values, n_tests=None):
+    """
+    Benjamini-Hochberg adjusted p-values (q-values). With n_tests larger than len(p_values),
+    the missing tests are taken to have p = 1, which leaves the adjustment of the given ones exact.
+    """
+    m = n_tests or len(p_values)
+    order = np.argsort(p_values, kind="stable")
+    ranked = p_values[order] * m / np.arange(1, len(p_values) + 1)
+    q_values = np.empty(len(p_values))
+    q_values[order] = np.minimum(np.minimum.accumulate(ranked[::-1])[::-1], 1.0)
+    return q_values
+
+def log_choose(n, k):
+    return special.gammaln(n + 1) - special.gammaln(k + 1) - special.gammaln(n - k + 1)
+
+def hypergeom_sf(k, N, K, n, rtol=1e-16):
+    """
+    P(X >= k) for X ~ Hypergeometric(N population, K successes, n draws), elementwise over arrays.
+    scipy.stats.hypergeom.sf evaluates each element separately (~100 us each), which is too slow for
+    millions of pairs. Here the pmf is summed from k over whichever tail is shorter: upward when k is
+    above the mode, otherwise the lower tail below k, subtracted from 1. Terms shrink away from the mode,
+    so the sums stop once the new terms no longer change them.
+    """
+    k, N, K, n = (np.asarray(x, dtype=np.float64) for x in np.broadcast_arrays(k, N, K, n))
+    lo, hi = np.maximum(0, n + K - N), np.minimum(n, K)
+    upper = k > np.floor((n + 1) * (K + 1) / (N + 2))
+    x = np.where(upper, k, k - 1)
+    in_support = (x >= lo) & (x <= hi)
+    xs = np.clip(x, lo, hi)
+    term = np.where(in_support, np.exp(log_choose(K, xs) + log_choose(N - K, n - xs) - log_choose(N, n)), 0.0)
+    total = term.copy()
+
+    active = np.flatnonzero(term > 0)
+    while active.size:
+        xa, Ka, Na, na, up = x[active], K[active], N[active], n[active], upper[active]
+        ratio = np.where(up,
+                         (Ka - xa) * (na - xa) / ((xa + 1) * (Na - Ka - na + xa + 1)),
+                         xa * (Na - Ka - na + xa) / ((Ka - xa + 1) * (na - xa + 1)))
+        x[active] = xa + np.where(up, 1, -1)
+        term[active] *= np.where(np.isfinite(ratio), np.maximum(ratio, 0), 0)
+        total[active] += term[active]
+        active = active[term[active] > rtol * total[active]]
+    return np.clip(np.where(upper, total, 1.0 - total), 0.0, 1.0)
+
+def domain_enrichment(matrices):
+    """
+    Over-representation of every domain among each chaperone's targets, against the pooled targets
+    of all chaperones: a one-sided hypergeometric test (Fisher's exact test) per pair, computed for all
+    pairs at once from the count matrices. Pairs without a shared target (p = 1) are not listed
+    but count as tests in the Benjamini-Hochberg correction.
+    Log-odds get the Haldane correction (+0.5 per cell) so that zero cells stay finite.
+    """
+    target_domain = matrices["target_domain"].astype(np.int64)
+    interacts = matrices["chaperone_target"].astype(np.int64)
+    interacts.data[:] = 1  # targets are counted once per chaperone, whatever the number of records
+    has_domain = (target_domain.sum(axis=1) > 0).astype(np.int64)
+
+    background = has_domain.sum()
+    chaperone_targets = interacts @ has_domain
+    domain_targets = target_domain.sum(axis=0)
+    hits = (interacts @ target_domain).tocoo()
+
+    k = hits.data
+    n = chaperone_targets[hits.row]
+    K = domain_targets[hits.col]
+    p_values = hypergeom_sf(k, background, K, n)
+    # 2x2 table: (chaperone target, other target) x (has domain, lacks domain)
+    a, b, c, d = k, n - k, K - k, background - n - K + k
+    log_odds = np.log((a + 0.5) * (d + 0.5) / ((b + 0.5) * (c + 0.5)))
+
+    result = pd.DataFrame({
+        "chaperone": hits.row, "domain": hits.col, "hits": k,
+        "chaperone_targets": n, "domain_targets": K, "background": background,
+        "log_odds": log_odds, "p_value": p_values,
+        "q_value": benjamini_hochberg(p_values, n_tests=target_domain.shape[1] * interacts.shape[0]),
+    })
+    return result.sort_values(["chaperone", "p_value", "log_odds"], ascending=[True, True, False], kind="stable")
+
+# ==========================================
+# PERMUTATION TEST
+# ==========================================
+_permutation_state = None
+
+def init_permutation_worker(interacts, target_domain, observed):
+    """
+    Keeps the matrices in each worker process, so tasks only carry a seed and a batch size.
+    """
+    global _permutation_state
+    rows, cols = observed.nonzero()
+    _permutation_state = (interacts, target_domain, observed, rows * observed.shape[1] + cols)
+
+def permutation_batch(seed, n_permutations):
+    """
+    For each observed (chaperone, domain) pair, how many of `n_permutations` random relabellings of
+    the targets give at least as many hits. One relabelling maps every chaperone's targets through the
+    same random permutation of all targets: chaperones keep their number of targets and their overlaps,
+    and each target keeps its own domain set (the rows of target_domain are never shuffled).
+    The permuted chaperone x target matrices are stacked into one block matrix, so the whole batch is
+    a single sparse product.
+    """
+    interacts, target_domain, observed, observed_keys = _permutation_state
+    n_chaps, n_targets = interacts.shape
+    nnz = interacts.nnz
+    rng = np.random.default_rng(seed)
+    relabel = rng.permuted(np.broadcast_to(np.arange(n_targets, dtype=np.int32), (n_permutations, n_targets)), axis=1)
+
+    indices = np.take_along_axis(relabel, np.broadcast_to(interacts.indices, (n_permutations, nnz)), axis=1).ravel()
+    indptr = np.append((np.arange(n_permutations)[:, None] * nnz + interacts.indptr[None, :-1]).ravel(), n_permutations * nnz)
+    stacked = sparse.csr_array((np.ones(len(indices), dtype=np.int32), indices, indptr),
+                               shape=(n_permutations * n_chaps, n_targets))
+    hits = (stacked @ target_domain).tocoo()
+
+    chaps = hits.row % n_chaps
+    observed_hits = observed[chaps, hits.col]
+    # Pairs never seen in the data (observed 0) always "exceed" and are not tested
+    exceed = (hits.data >= observed_hits) & (observed_hits > 0)
+    counts = np.bincount(chaps[exceed] * observed.shape[1] + hits.col[exceed], minlength=observed.size)
+    return counts[observed_keys]
+
+def permutation_test(matrices, n_permutations, workers=PERMUTATION_WORKERS, seed=PERMUTATION_SEED, batch_size=PERMUTATION_BATCH):
+    """
+    Empirical p-values (with the +1 correction) for every (chaperone, domain) pair that shares a target,
+    plus Benjamini-Hochberg q-values over all chaperone x domain tests.
+    Batches are seeded from SeedSequence(seed).spawn, so results do not depend on `workers`.
+    """
+    interacts = matrices["chaperone_target"].astype(np.int32)
+    interacts.data[:] = 1
+    target_domain = matrices["target_domain"].astype(np.int32)
+    observed = (interacts @ target_domain).toarray()
+
+    sizes = [batch_size] * (n_permutations // batch_size)
+    if n_permutations % batch_size:
+        sizes.append(n_permutations % batch_size)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    init_args = (interacts, target_domain, observed)
+
+    rows, cols = observed.nonzero()
+    exceed = np.zeros(len(rows), dtype=np.int64)
+    if workers <= 1:
+        init_permutation_worker(*init_args)
+        for counts in map(permutation_batch, seeds, sizes):
+            exceed += counts
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_permutation_worker, initargs=init_args) as pool:
+            for counts in pool.map(permutation_batch, seeds, sizes):
+                exceed += counts
+
+    p_values = (exceed + 1) / (n_permutations + 1)
+    chaperone_targets = interacts.sum(axis=1)
+    domain_targets = target_domain.sum(axis=0)
+    result = pd.DataFrame({
+        "chaperone": rows, "domain": cols, "hits": observed[rows, cols],
+        # Mean hits under relabelling: each target is one of the chaperone's with probability n_c / N
+        "expected": chaperone_targets[rows] * domain_targets[cols] / interacts.shape[1],
+        "p_value": p_values,
+        "q_value": benjamini_hochberg(p_values, n_tests=observed.size),
+    })
+    return result.sort_values(["chaperone", "p_value", "hits"], ascending=[True, True, False], kind="stable")
+
+# ==========================================
+# REPORTS
+# ==========================================
+def load_analysis():
+    """
+    Count matrices of the newest master file, or None (with a message) if there is none.
+    """
     # 1. Check if data exists
-    if not os.path.exists(MASTER_FILE):
+    master_file = find_master_file()
+    if master_file is None:
         print(f"Error: '{MASTER_FILE}' not found.")
         print("Please run 'chaperone_miner.py' first to generate the data.")
-        return
+        return None
 
-    # 2. Load the data
-    print(f"Loading {MASTER_FILE}...")
+    # 2. Load the count matrices (built from the data on first use)
     try:
-        df = pd.read_csv(MASTER_FILE)
+        return load_count_matrices(master_file)
     except Exception as e:
-        print(f"Error reading CSV: {e}")
+        print(f"Error reading {master_file}: {e}")
+        return None
+
+def analyze_preferences():
+    matrices = load_analysis()
+    if matrices is None:
         return
 
     # 3. Basic Stats
-    total_interactions = len(df)
-    unique_chaperones = df['Chaperone_Name'].unique()
+    total_interactions = matrices["total_rows"]
+    unique_chaperones = matrices["chaperones"]
+    totals = matrices["chaperone_rows"]
+    domain_names = matrices["domains"]
+    top = top_domains(matrices)
     print(f"Loaded {total_interactions} domain interactions for {len(unique_chaperones)} chaperones.\n")
-    
+
     # 4. Analyze each chaperone
-    for chap in unique_chaperones:
+    for chap_code, chap in enumerate(unique_chaperones):
         print(f"=========================================")
         print(f"  PREFERENCES FOR: {chap}")
         print(f"=========================================")
-        
-        # Filter data for just this chaperone
-        subset = df[df['Chaperone_Name'] == chap]
-        total_targets = len(subset)
-        
+
+        total_targets = totals[chap_code]
+
         if total_targets == 0:
             print("  No targets found.\n")
             continue
-            
-        # Count domain frequencies
-        # We group by Domain_ID and count how many times it appears
-        domain_counts = subset['Domain_ID'].value_counts()
-        
+
+        # Domain frequencies for this chaperone, from the count matrix
+        domain_codes, domain_counts = top[chap_code]
+
         print(f"  Total Domains Found: {total_targets}")
-        print(f"  Top 15 Most Frequent Domains:")
+        print(f"  Top {TOP_K} Most Frequent Domains:")
         print(f"  ---------------------------------------------")
         print(f"  {'Domain ID':<12} | {'Count':<6} | {'% of Clients':<12}")
         print(f"  ---------------------------------------------")
-        
-        for domain, count in domain_counts.head(15).items():
+
+        for domain, count in zip(domain_names[domain_codes], domain_counts):
             percent = (count / total_targets) * 100
             # Basic interpretation helper (You can expand this dictionary manually if specific IDs are common)
             # e.g. PF00069 is usually Protein Kinase
             print(f"  {domain:<12} | {count:<6} | {percent:.1f}%")
-        
+
+        print("\n")
+
+def analyze_enrichment(fdr=ENRICHMENT_FDR):
+    """
+    Domains over-represented among each chaperone's targets, relative to all mined targets.
+    """
+    matrices = load_analysis()
+    if matrices is None:
+        return
+
+    enrichment = domain_enrichment(matrices)
+    domain_names = matrices["domains"]
+    by_chaperone = dict(iter(enrichment[enrichment["q_value"] <= fdr].groupby("chaperone", sort=False)))
+    background = int(enrichment["background"].iloc[0]) if not enrichment.empty else 0
+    print(f"Tested {len(matrices['chaperones'])} chaperones x {len(domain_names)} domains "
+          f"against a background of {background} targets (BH FDR {fdr:.0%}).\n")
+
+    for chap_code, chap in enumerate(matrices["chaperones"]):
+        print(f"=========================================")
+        print(f"  ENRICHED DOMAINS FOR: {chap}")
+        print(f"=========================================")
+
+        significant = by_chaperone.get(chap_code)
+        if significant is None:
+            print(f"  No domains enriched at FDR {fdr:.0%}.\n")
+            continue
+
+        print(f"  Targets with domains: {significant['chaperone_targets'].iloc[0]}")
+        print(f"  Top {TOP_K} Enriched Domains:")
+        print(f"  -------------------------------------------------------------------------")
+        print(f"  {'Domain ID':<12} | {'Hits':<6} | {'Background':<10} | {'Log-odds':>8} | {'p-value':>9} | {'q-value':>9}")
+        print(f"  -------------------------------------------------------------------------")
+
+        for row in significant.head(TOP_K).itertuples():
+            print(f"  {domain_names[row.domain]:<12} | {row.hits:<6} | {row.domain_targets:<10} | "
+                  f"{row.log_odds:8.2f} | {row.p_value:9.2e} | {row.q_value:9.2e}")
+
         print("\n")
 
+def analyze_permutations(n_permutations, workers=PERMUTATION_WORKERS, seed=PERMUTATION_SEED, fdr=ENRICHMENT_FDR):
+    """
+    Domains whose hit counts are rarely reached when targets are relabelled at random.
+    """
+    matrices = load_analysis()
+    if matrices is None:
+        return
+
+    print(f"Running {n_permutations} permutations on {workers} worker(s), seed {seed}...")
+    start = time.perf_counter()
+    result = permutation_test(matrices, n_permutations, workers=workers, seed=seed)
+    print(f"Done in {time.perf_counter() - start:.1f} s. Smallest attainable p-value: {1 / (n_permutations + 1):.1e} (BH FDR {fdr:.0%}).\n")
+
+    domain_names = matrices["domains"]
+    by_chaperone = dict(iter(result[result["q_value"] <= fdr].groupby("chaperone", sort=False)))
+    for chap_code, chap in enumerate(matrices["chaperones"]):
+        print(f"=========================================")
+        print(f"  PERMUTATION TEST FOR: {chap}")
+        print(f"=========================================")
+
+        significant = by_chaperone.get(chap_code)
+        if significant is None:
+            print(f"  No domains significant at FDR {fdr:.0%}.\n")
+            continue
+
+        print(f"  Top {TOP_K} Domains by Empirical p-value:")
+        print(f"  -------------------------------------------------------------")
+        print(f"  {'Domain ID':<12} | {'Hits':<6} | {'Expected':>8} | {'p-value':>9} | {'q-value':>9}")
+        print(f"  -------------------------------------------------------------")
+
+        for row in significant.head(TOP_K).itertuples():
+            print(f"  {domain_names[row.domain]:<12} | {row.hits:<6} | {row.expected:8.1f} | "
+                  f"{row.p_value:9.2e} | {row.q_value:9.2e}")
+
+        print("\n")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Report the Pfam domain preferences of each chaperone from the master table.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--enrichment", action="store_true",
+                      help=f"rank domains by over-representation against all mined targets (hypergeometric test, "
+                           f"Benjamini-Hochberg FDR {ENRICHMENT_FDR}) instead of by raw frequency")
+    mode.add_argument("--permutations", type=int, metavar="N",
+                      help="rank domains by empirical p-values from N random relabellings of the targets, "
+                           "which keep each target's domain set (e.g. 10000)")
+    parser.add_argument("--workers", type=int, default=PERMUTATION_WORKERS,
+                        help=f"worker processes for --permutations (default: {PERMUTATION_WORKERS})")
+    parser.add_argument("--seed", type=int, default=PERMUTATION_SEED,
+                        help=f"random seed for --permutations (default: {PERMUTATION_SEED})")
+    args = parser.parse_args(argv)
+    if args.permutations is not None and args.permutations < 1:
+        parser.error("--permutations must be at least 1")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.permutations:
+        analyze_permutations(args.permutations, workers=max(1, args.workers), seed=args.seed)
+    elif args.enrichment:
+        analyze_enrichment()
+    else:
+        analyze_preferences()
+
 if __name__ == "__main__":
-    analyze_preferences()
\ No newline at end of file
+    main()